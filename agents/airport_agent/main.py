@@ -1,14 +1,16 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 from typing import Optional
-import json
+import asyncio
 from datetime import datetime
-from airport_agent import config, agent, AgentMessage
+from airport_agent import config, agent, api_client, AgentMessage
 from fastapi.middleware.cors import CORSMiddleware
 
 # Ton code existant ici (ou import depuis un module)
 
-app = FastAPI(title="Airport Intelligence API", version="1.0")
+# orjson encodes the nested airports x peaks payloads much faster than stdlib json
+app = FastAPI(title="Airport Intelligence API", version="1.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +22,10 @@ app.add_middleware(
 class AirportRequest(BaseModel):
     airport_code: str
 
+@app.on_event("shutdown")
+async def close_http_sessions():
+    await api_client.aclose()
+
 @app.get("/")
 def root():
     return {"message": "Airport Intelligence API is running!"}
@@ -39,18 +45,25 @@ def analyze_airport(request: AirportRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/all_airports")
-def analyze_all_airports():
+async def analyze_all_airports():
+    now = datetime.now()
     all_recommendations = {}
     
-    for airport_code in config.airports.keys():
-        recommendation = agent.get_recommendation(airport_code)
+    # Fetch every airport concurrently: latency is the slowest airport, not the sum
+    airport_codes = list(config.airports.keys())
+    recommendations = await asyncio.gather(
+        *[agent.get_recommendation_async(code) for code in airport_codes]
+    )
+    
+    for airport_code, recommendation in zip(airport_codes, recommendations):
         all_recommendations[airport_code] = AgentMessage.format_for_orchestrator(
             agent_id=f"airport_agent_{airport_code.lower()}",
-            recommendation=recommendation
+            recommendation=recommendation,
+            now=now
         )
     
     return {
         "city": config.city,
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
         "airports": all_recommendations
     }
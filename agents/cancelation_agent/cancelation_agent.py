@@ -1,15 +1,26 @@
 # Uber Data Intelligence Agent - CSV Version
 
 import pandas as pd
+import numpy as np
+import copy
+import threading
+from collections import OrderedDict
 from datetime import datetime
 import json
-from typing import Dict
+import logging
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
 from groq import Groq
 import os
+import sys
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -21,17 +32,35 @@ HOURS_AHEAD = 12
 CANCELLATION_CSV_PATH = "cancellation_data.csv"
 SURGE_CSV_PATH = "surge_data.csv"
 
+# Colonnes lues et types explicites (pas d'inférence, colonnes inutiles ignorées)
+CANCELLATION_DTYPES = {'city_id': 'int32', 'hexagon_id9': 'string', 'job_count': 'int32', 'cancellation_rate_pct': 'float32'}
+SURGE_DTYPES = {'city_id': 'int32', 'hour': 'int8', 'surge_multiplier': 'float32'}
+
+# Au-delà de cette taille, le CSV est lu par blocs pour limiter le pic mémoire
+CSV_CHUNKED_MIN_BYTES = 200 * 1024 * 1024
+CSV_CHUNK_ROWS = 500_000
+
+# Fichiers issus du pipeline interne (schéma connu): pas de tolérance aux lignes invalides par défaut.
+# Activable avec --tolerate-bad-lines pour relire un CSV malformé avec le parser Python.
+TOLERATE_BAD_LINES = False
+
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GROQ_MODEL = "llama-3.1-8b-instant"
 TEMPERATURE = 0.4
 MAX_TOKENS = 1500
+RESPONSE_CACHE_MAX_ENTRIES = 128
 
 # Thresholds
 HIGH_CANCELLATION_THRESHOLD = 15  # percent
 LOW_CANCELLATION_THRESHOLD = 5    # percent
 HIGH_SURGE_THRESHOLD = 1.5
+MEDIUM_SURGE_THRESHOLD = 1.2
 MINIMUM_JOBS_THRESHOLD = 50
 
+# Parsing des réponses IA
+CODE_FENCE_RE = re.compile(r'^\s*```\w*\s*$', re.M)
+JSON_DECODER = json.JSONDecoder()
+
 # ============================================================================
 # CSV Data Loader
 # ============================================================================
@@ -39,9 +68,55 @@ MINIMUM_JOBS_THRESHOLD = 50
 class UberDataLoader:
     """Charge les données Uber depuis des fichiers CSV"""
     
-    def __init__(self, cancellation_path: str, surge_path: str):
+    def __init__(self, cancellation_path: str, surge_path: str, tolerate_bad_lines: bool = TOLERATE_BAD_LINES):
         self.cancellation_path = cancellation_path
         self.surge_path = surge_path
+        self.tolerate_bad_lines = tolerate_bad_lines
+        # path -> (mtime, DataFrame déjà chargé), réutilisé tant que le fichier n'a pas changé;
+        # une nouvelle version du fichier remplace l'ancienne entrée
+        self._cache: Dict[str, Tuple[float, pd.DataFrame]] = {}
+        # path -> (DataFrame de surge en cache, surge moyen par heure calculé au chargement)
+        self._hourly_avg: Dict[str, Tuple[pd.DataFrame, np.ndarray]] = {}
+    
+    @staticmethod
+    def _read_csv(path: str, dtypes: Dict[str, str], dropna_subset: List[str]) -> pd.DataFrame:
+        """Lecture rapide: moteur pyarrow (multithread), moteur C si pyarrow est absent ou refuse le fichier"""
+        if os.path.getsize(path) > CSV_CHUNKED_MIN_BYTES:
+            # Gros fichier: lecture par blocs nettoyés un par un (pic mémoire = un bloc)
+            chunks = pd.read_csv(path, engine='c', usecols=list(dtypes), dtype=dtypes, chunksize=CSV_CHUNK_ROWS)
+            return pd.concat((chunk.dropna(subset=dropna_subset) for chunk in chunks), ignore_index=True)
+        
+        try:
+            # Colonnes Arrow (chaînes compactes, kernels vectorisés) au lieu d'objets Python
+            arrow_dtypes = {col: f"{dtype}[pyarrow]" for col, dtype in dtypes.items()}
+            return pd.read_csv(path, engine='pyarrow', usecols=list(dtypes), dtype=arrow_dtypes)
+        except (ImportError, ValueError):
+            return pd.read_csv(path, engine='c', usecols=list(dtypes), dtype=dtypes)
+    
+    def _load_cached(self, path: str, dtypes: Dict[str, str], dropna_subset: List[str]) -> pd.DataFrame:
+        """Cache Parquet à côté du CSV: le CSV n'est reparsé que s'il a été modifié"""
+        cache = path + '.parquet'
+        try:
+            if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+                return pd.read_parquet(cache)
+        except (ImportError, ValueError, OSError):
+            pass  # Pas de moteur Parquet ou cache corrompu: on relit le CSV
+        
+        df = self._read_csv(path, dtypes, dropna_subset)
+        tmp = None
+        try:
+            # Écriture dans un fichier temporaire voisin puis remplacement atomique:
+            # un lecteur ne voit jamais un cache à moitié écrit
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache) or '.', suffix='.tmp')
+            os.close(fd)
+            df.to_parquet(tmp, compression='zstd')
+            os.replace(tmp, cache)
+        except (ImportError, ValueError, OSError):
+            pass  # Cache optionnel (pas de moteur Parquet, colonne non sérialisable ou dossier en lecture seule)
+        finally:
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+        return df
     
     def load_cancellation_data(self) -> pd.DataFrame:
         """
@@ -51,19 +126,15 @@ class UberDataLoader:
         city_id, hexagon_id9, job_count, cancellation_rate_pct
         """
         try:
-            # Lecture avec options de parsing plus flexibles
-            df = pd.read_csv(
-                self.cancellation_path,
-                encoding='utf-8',
-                sep=',',
-                quotechar='"',
-                escapechar='\\',
-                on_bad_lines='warn',  # Affiche un warning au lieu de crasher
-                engine='python'  # Parser Python plus tolérant
-            )
+            mtime = os.path.getmtime(self.cancellation_path)
+            cached = self._cache.get(self.cancellation_path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            
+            df = self._load_cached(self.cancellation_path, CANCELLATION_DTYPES, ['hexagon_id9', 'cancellation_rate_pct'])
             
             # Validation des colonnes requises
-            required_columns = ['city_id', 'hexagon_id9', 'job_count', 'cancellation_rate_pct']
+            required_columns = list(CANCELLATION_DTYPES)
             
             missing_columns = [col for col in required_columns if col not in df.columns]
             if missing_columns:
@@ -72,15 +143,18 @@ class UberDataLoader:
             # Nettoyage: supprimer les lignes avec des valeurs manquantes critiques
             df = df.dropna(subset=['hexagon_id9', 'cancellation_rate_pct'])
             
-            print(f"✓ Données d'annulation chargées: {len(df)} zones")
+            logger.info("✓ Données d'annulation chargées: %d zones", len(df))
+            self._cache[self.cancellation_path] = (mtime, df)
             return df
             
         except FileNotFoundError:
             raise FileNotFoundError(f"Fichier non trouvé: {self.cancellation_path}")
-        except Exception as e:
-            print(f"\n⚠️  Erreur de parsing du CSV. Tentative avec des options alternatives...")
+        except pd.errors.ParserError as e:
+            if not self.tolerate_bad_lines:
+                raise
+            # Seul un fichier réellement malformé passe par le parser Python (lent mais tolérant)
+            logger.warning("⚠️  Erreur de parsing du CSV. Tentative avec des options alternatives...")
             try:
-                # Tentative avec séparateur alternatif
                 df = pd.read_csv(
                     self.cancellation_path,
                     encoding='utf-8',
@@ -88,10 +162,24 @@ class UberDataLoader:
                     engine='python',
                     on_bad_lines='skip'  # Ignore les lignes problématiques
                 )
-                print(f"✓ Données chargées avec détection automatique du séparateur")
+                logger.info("✓ Données chargées avec détection automatique du séparateur")
                 return df
-            except:
-                raise Exception(f"Erreur lors du chargement de {self.cancellation_path}: {str(e)}")
+            except ValueError as fallback_error:
+                raise Exception(f"Erreur lors du chargement de {self.cancellation_path}: {str(e)}") from fallback_error
+    
+    @staticmethod
+    def hourly_surge_average(df: pd.DataFrame) -> np.ndarray:
+        """Surge moyen par heure (index 0-23), 1.0 pour les heures sans données"""
+        return (df.groupby('hour')['surge_multiplier'].mean()
+                  .reindex(range(24), fill_value=1.0)
+                  .to_numpy(dtype=float))
+    
+    def surge_hourly_average(self, df: pd.DataFrame) -> np.ndarray:
+        """Moyenne horaire précalculée si df est le DataFrame de surge en cache, sinon calculée"""
+        cached = self._hourly_avg.get(self.surge_path)
+        if cached is not None and cached[0] is df:
+            return cached[1]
+        return self.hourly_surge_average(df)
     
     def load_surge_data(self) -> pd.DataFrame:
         """
@@ -101,19 +189,15 @@ class UberDataLoader:
         city_id, hour, surge_multiplier
         """
         try:
-            # Lecture avec options de parsing plus flexibles
-            df = pd.read_csv(
-                self.surge_path,
-                encoding='utf-8',
-                sep=',',
-                quotechar='"',
-                escapechar='\\',
-                on_bad_lines='warn',
-                engine='python'
-            )
+            mtime = os.path.getmtime(self.surge_path)
+            cached = self._cache.get(self.surge_path)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            
+            df = self._load_cached(self.surge_path, SURGE_DTYPES, ['surge_multiplier', 'hour'])
             
             # Validation des colonnes requises
-            required_columns = ['city_id', 'hour', 'surge_multiplier']
+            required_columns = list(SURGE_DTYPES)
             
             missing_columns = [col for col in required_columns if col not in df.columns]
             if missing_columns:
@@ -121,14 +205,19 @@ class UberDataLoader:
             
             # Nettoyage
             df = df.dropna(subset=['surge_multiplier', 'hour'])
+            self._hourly_avg[self.surge_path] = (df, self.hourly_surge_average(df))
             
-            print(f"✓ Données de surge chargées: {len(df)} entrées")
+            logger.info("✓ Données de surge chargées: %d entrées", len(df))
+            self._cache[self.surge_path] = (mtime, df)
             return df
             
         except FileNotFoundError:
             raise FileNotFoundError(f"Fichier non trouvé: {self.surge_path}")
-        except Exception as e:
-            print(f"\n⚠️  Erreur de parsing du CSV. Tentative avec des options alternatives...")
+        except pd.errors.ParserError as e:
+            if not self.tolerate_bad_lines:
+                raise
+            # Seul un fichier réellement malformé passe par le parser Python (lent mais tolérant)
+            logger.warning("⚠️  Erreur de parsing du CSV. Tentative avec des options alternatives...")
             try:
                 df = pd.read_csv(
                     self.surge_path,
@@ -137,10 +226,10 @@ class UberDataLoader:
                     engine='python',
                     on_bad_lines='skip'
                 )
-                print(f"✓ Données chargées avec détection automatique du séparateur")
+                logger.info("✓ Données chargées avec détection automatique du séparateur")
                 return df
-            except:
-                raise Exception(f"Erreur lors du chargement de {self.surge_path}: {str(e)}")
+            except ValueError as fallback_error:
+                raise Exception(f"Erreur lors du chargement de {self.surge_path}: {str(e)}") from fallback_error
 
 
 class UberDataAgentConfig:
@@ -159,97 +248,136 @@ Respond ONLY in valid JSON."""
 
 config = UberDataAgentConfig(city=CITY, hours_ahead=HOURS_AHEAD)
 
+# Client Groq partagé: un seul pool de connexions HTTP (et une seule négociation TLS) par processus
+_GROQ: Optional[Groq] = None
+
+def _get_groq() -> Groq:
+    global _GROQ
+    if _GROQ is None:
+        _GROQ = Groq(api_key=GROQ_API_KEY)
+    return _GROQ
+
 
 class UberDataIntelligenceAgent:
+    # hash du prompt (+ heure courante) -> analyse IA, LRU partagé entre les instances
+    _response_cache: "OrderedDict[str, Dict]" = OrderedDict()
+    _response_cache_lock = threading.Lock()
+    
     def __init__(self, config: UberDataAgentConfig, data_loader: UberDataLoader):
         self.config = config
         self.agent_id = f"uber_data_agent_{config.city.lower().replace(' ', '_')}"
-        self.groq_client = Groq(api_key=config.groq_api_key)
+        self.groq_client = _get_groq()
         self.data_loader = data_loader
     
     def get_recommendation(self) -> Dict:
         """Main entry point"""
         
         # Charger les données depuis les CSV
-        print("Chargement des données...")
+        logger.info("Chargement des données...")
         cancellation_df = self.data_loader.load_cancellation_data()
         surge_df = self.data_loader.load_surge_data()
         
         return self.analyze_with_ai(cancellation_df, surge_df)
     
+    def _ask_groq(self, user_prompt: str) -> Dict:
+        """Appelle Groq et extrait le JSON de la réponse"""
+        
+        logger.info("Analyse des données avec l'IA...")
+        chat_completion = self.groq_client.chat.completions.create(
+            model=self.config.groq_model,
+            messages=[
+                {"role": "system", "content": self.config.system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens
+        )
+        
+        ai_response = chat_completion.choices[0].message.content
+        
+        # Parser le JSON: retrait des balises ``` puis décodage en une passe depuis la première accolade
+        cleaned = CODE_FENCE_RE.sub('', ai_response)
+        json_start = cleaned.find('{')
+        if json_start < 0:
+            raise ValueError("Aucun objet JSON dans la réponse de l'IA")
+        ai_analysis, _ = JSON_DECODER.raw_decode(cleaned, json_start)
+        return ai_analysis
+    
     def analyze_with_ai(self, cancellation_df: pd.DataFrame, surge_df: pd.DataFrame) -> Dict:
         """Analyse les données avec Groq AI"""
         
         now = datetime.now()
         
-        # Préparation de l'analyse par zone
-        zones_analysis = []
+        # Surge des 6 prochaines heures: identique pour toutes les zones (pas de hexagon_id9 dans surge)
+        # Heures à venir codées en masque 24 bits: un décalage + ET par ligne, sans set ni copie du DataFrame
+        hour_bits = 0
+        for i in range(1, 7):
+            hour_bits |= 1 << ((now.hour + i) % 24)
+        hours = surge_df['hour'].to_numpy(dtype=np.int64)
+        upcoming_surge = surge_df['surge_multiplier'].to_numpy(dtype=float)[((hour_bits >> hours) & 1).astype(bool)]
+        avg_surge = float(upcoming_surge.mean()) if len(upcoming_surge) > 0 else 1.0
+        max_surge = float(upcoming_surge.max()) if len(upcoming_surge) > 0 else 1.0
         
-        for _, zone in cancellation_df.iterrows():
-            zone_id = str(zone['hexagon_id9'])  # Utiliser directement l'ID de la zone
-            
-            # Obtenir les données de surge pour les prochaines heures (toutes zones confondues car pas de hexagon_id9 dans surge)
-            upcoming_hours = [(now.hour + i) % 24 for i in range(1, 7)]
-            zone_surge = surge_df[surge_df['hour'].isin(upcoming_hours)]
-            
-            # Calculer la moyenne de surge pour les prochaines heures
-            avg_surge = zone_surge['surge_multiplier'].mean() if len(zone_surge) > 0 else 1.0
-            max_surge = zone_surge['surge_multiplier'].max() if len(zone_surge) > 0 else 1.0
-            
-            # Calcul du score de zone
-            cancellation_penalty = zone['cancellation_rate_pct'] / 100
-            surge_bonus = avg_surge
-            score = (surge_bonus * 100) * (1 - cancellation_penalty)
-            
-            # Classification de la qualité
-            if zone['cancellation_rate_pct'] < LOW_CANCELLATION_THRESHOLD and avg_surge > HIGH_SURGE_THRESHOLD:
-                quality = "excellent"
-            elif zone['cancellation_rate_pct'] < HIGH_CANCELLATION_THRESHOLD and avg_surge > 1.2:
-                quality = "good"
-            elif zone['cancellation_rate_pct'] > HIGH_CANCELLATION_THRESHOLD:
-                quality = "poor"
-            else:
-                quality = "average"
-            
-            zones_analysis.append({
-                'zone_id': zone_id,  # Code de zone au lieu de nom
-                'cancellation_rate': float(zone['cancellation_rate_pct']),
-                'avg_surge_next_6h': round(float(avg_surge), 2),
-                'max_surge_next_6h': round(float(max_surge), 2),
-                'job_count': int(zone['job_count']),
-                'quality': quality,
-                'score': round(float(score), 2)
-            })
+        # Score de toutes les zones en une seule passe vectorisée
+        cancellation_rate = cancellation_df['cancellation_rate_pct'].to_numpy(dtype=float)
+        score = ((avg_surge * 100) * (1 - cancellation_rate / 100)).round(2)
+        zones_count = len(score)
         
-        # Tri par score
-        zones_analysis.sort(key=lambda x: x['score'], reverse=True)
+        # Top 10 en O(N): seuil par partition, puis tri stable des seuls candidats
+        # (à score égal, les zones restent dans l'ordre du fichier)
+        k = min(10, zones_count)
+        if k:
+            threshold = np.partition(score, zones_count - k)[zones_count - k]
+            candidates = np.flatnonzero(score >= threshold)
+            top_idx = candidates[np.argsort(-score[candidates], kind='stable')[:k]]
+        else:
+            top_idx = np.array([], dtype=int)
         
-        # Obtenir les pics de surge
-        now_hour = now.hour
-        next_hours = [(now_hour + i) % 24 for i in range(1, self.config.hours_ahead)]
-        upcoming_surge = surge_df[surge_df['hour'].isin(next_hours)]
+        # Seules les 10 meilleures zones sont converties en dicts (prompt + raw_data)
+        top_rate = cancellation_rate[top_idx]
+        quality = np.select(
+            [
+                (top_rate < LOW_CANCELLATION_THRESHOLD) & (avg_surge > HIGH_SURGE_THRESHOLD),
+                (top_rate < HIGH_CANCELLATION_THRESHOLD) & (avg_surge > MEDIUM_SURGE_THRESHOLD),
+                top_rate > HIGH_CANCELLATION_THRESHOLD
+            ],
+            ['excellent', 'good', 'poor'],
+            default='average'
+        )
+        top_zones = cancellation_df.iloc[top_idx]
         
-        surge_peaks = upcoming_surge.groupby('hour').agg({
-            'surge_multiplier': 'mean'
-        }).reset_index()
+        top_zones_df = pd.DataFrame({
+            'zone_id': top_zones['hexagon_id9'].astype(str).to_numpy(),  # Code de zone au lieu de nom
+            'cancellation_rate': top_rate.round(2),
+            'avg_surge_next_6h': round(avg_surge, 2),
+            'max_surge_next_6h': round(max_surge, 2),
+            'job_count': top_zones['job_count'].to_numpy(dtype=int),
+            'quality': quality,
+            'score': score[top_idx]
+        })
+        top_zones_json = top_zones_df.to_json(orient='records')  # JSON compact: moins de tokens
+        zones_analysis = top_zones_df.head(5).to_dict('records')
         
-        surge_peaks = surge_peaks[surge_peaks['surge_multiplier'] > 1.5].sort_values('surge_multiplier', ascending=False)
+        # Obtenir les pics de surge (moyenne horaire précalculée au chargement)
+        hourly_avg = self.data_loader.surge_hourly_average(surge_df)
         
-        surge_times = []
-        for _, row in surge_peaks.head(5).iterrows():
-            surge_times.append({
-                'hour': int(row['hour']),
-                'avg_surge': round(float(row['surge_multiplier']), 2)
-            })
+        next_hours = np.array([(now.hour + i) % 24 for i in range(1, self.config.hours_ahead)])
+        means = hourly_avg[next_hours]
+        top = [i for i in np.argsort(-means, kind='stable') if means[i] > 1.5][:5]
+        
+        surge_times = [
+            {'hour': int(next_hours[i]), 'avg_surge': round(float(means[i]), 2)}
+            for i in top
+        ]
         
         # Préparation du prompt pour l'IA
         user_prompt = f"""Analyze Uber data for {self.config.city}:
 
 TOP ZONES (by score):
-{json.dumps(zones_analysis[:10], indent=2)}
+{top_zones_json}
 
 HIGH SURGE HOURS:
-{json.dumps(surge_times, indent=2)}
+{json.dumps(surge_times, separators=(',', ':'))}
 
 Identify ALL optimal zones and time windows. Use ONLY zone_id codes (do NOT create zone names). Provide MULTIPLE recommendations ranked by priority. Respond in JSON:
 {{
@@ -325,39 +453,35 @@ Identify ALL optimal zones and time windows. Use ONLY zone_id codes (do NOT crea
 
 CRITICAL: Use ONLY the zone_id codes from the data provided. Do NOT invent zone names. Reference zones by their hexagon_id9 codes ONLY."""
 
+        # Données inchangées dans la même heure => même prompt: on réutilise la réponse sans appeler Groq
+        cache_key = hashlib.blake2b(
+            f"{self.config.groq_model}|{now:%Y-%m-%d %H}|{self.config.system_prompt}|{user_prompt}".encode(),
+            digest_size=16
+        ).hexdigest()
+        with self._response_cache_lock:
+            ai_analysis = self._response_cache.get(cache_key)
+            if ai_analysis is not None:
+                self._response_cache.move_to_end(cache_key)
+                # Copie: un appelant qui modifie le résultat ne doit pas altérer le cache
+                ai_analysis = copy.deepcopy(ai_analysis)
+        
         try:
-            print("Analyse des données avec l'IA...")
-            chat_completion = self.groq_client.chat.completions.create(
-                model=self.config.groq_model,
-                messages=[
-                    {"role": "system", "content": self.config.system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
-            )
-            
-            ai_response = chat_completion.choices[0].message.content
-            
-            # Parser le JSON
-            cleaned = ai_response.strip()
-            if cleaned.startswith('```'):
-                lines = cleaned.split('\n')
-                cleaned = '\n'.join([l for l in lines if not l.strip().startswith('```')])
-            
-            json_start = cleaned.find('{')
-            json_end = cleaned.rfind('}') + 1
-            ai_analysis = json.loads(cleaned[json_start:json_end])
+            if ai_analysis is None:
+                ai_analysis = self._ask_groq(user_prompt)
+                with self._response_cache_lock:
+                    self._response_cache[cache_key] = copy.deepcopy(ai_analysis)
+                    while len(self._response_cache) > RESPONSE_CACHE_MAX_ENTRIES:
+                        self._response_cache.popitem(last=False)
             
             return {
                 'status': 'success',
                 'agent_id': self.agent_id,
                 'timestamp': datetime.now().isoformat(),
                 'city': self.config.city,
-                'zones_analyzed': len(zones_analysis),
+                'zones_analyzed': zones_count,
                 'ai_analysis': ai_analysis,
                 'raw_data': {
-                    'top_zones': zones_analysis[:5],
+                    'top_zones': zones_analysis,
                     'surge_peaks': surge_times
                 }
             }
@@ -368,9 +492,9 @@ CRITICAL: Use ONLY the zone_id codes from the data provided. Do NOT invent zone
                 'agent_id': self.agent_id,
                 'timestamp': datetime.now().isoformat(),
                 'error': str(e),
-                'zones_analyzed': len(zones_analysis),
+                'zones_analyzed': zones_count,
                 'raw_data': {
-                    'top_zones': zones_analysis[:5],
+                    'top_zones': zones_analysis,
                     'surge_peaks': surge_times
                 }
             }
@@ -381,10 +505,13 @@ CRITICAL: Use ONLY the zone_id codes from the data provided. Do NOT invent zone
 # ============================================================================
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Initialiser le chargeur de données
     data_loader = UberDataLoader(
         cancellation_path=CANCELLATION_CSV_PATH,
-        surge_path=SURGE_CSV_PATH
+        surge_path=SURGE_CSV_PATH,
+        tolerate_bad_lines=TOLERATE_BAD_LINES or "--tolerate-bad-lines" in sys.argv
     )
     
     # Créer l'agent
@@ -17,12 +17,9 @@ Then runs "what if" simulations to optimize their schedule.
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-import seaborn as sns
 from dataclasses import dataclass
 from typing import Dict, List, Tuple, Optional
 import warnings
-warnings.filterwarnings('ignore')
 
 @dataclass
 class DriverProfile:
@@ -43,11 +40,13 @@ class DigitalTwinAgent:
     
     def __init__(self, data_path: str = "data/uber_mock_data.xlsx"):
         """Initialize with all necessary data"""
-        # Load all data sheets
-        self.rides_data = pd.read_excel(data_path, sheet_name="rides_trips")
-        self.earnings_data = pd.read_excel(data_path, sheet_name="earnings_daily") 
-        self.incentives_data = pd.read_excel(data_path, sheet_name="incentives_weekly")
-        self.surge_data = pd.read_excel(data_path, sheet_name="surge_by_hour")
+        # Load all data sheets (openpyxl warns about workbook styling; silence only that here)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=UserWarning)
+            self.rides_data = pd.read_excel(data_path, sheet_name="rides_trips")
+            self.earnings_data = pd.read_excel(data_path, sheet_name="earnings_daily") 
+            self.incentives_data = pd.read_excel(data_path, sheet_name="incentives_weekly")
+            self.surge_data = pd.read_excel(data_path, sheet_name="surge_by_hour")
         
         # Preprocess data
         self._preprocess_data()
@@ -130,7 +129,9 @@ class DigitalTwinAgent:
         surge_merged = pd.merge(hourly_rides, self.surge_data, left_on='hour', right_on='hour', how='left')
         
         if len(surge_merged) > 1:
-            correlation = surge_merged['ride_count'].corr(surge_merged['surge_multiplier'])
+            # Constant series give NaN (handled below) plus a RuntimeWarning
+            with np.errstate(invalid='ignore', divide='ignore'):
+                correlation = surge_merged['ride_count'].corr(surge_merged['surge_multiplier'])
             return correlation if not pd.isna(correlation) else 0.0
         return 0.0
     
@@ -146,7 +147,8 @@ class DigitalTwinAgent:
         
         # Find the point where longer hours correlate with lower efficiency
         if len(daily_stats) > 5:
-            correlation = daily_stats['working_hours'].corr(daily_stats['avg_efficiency'])
+            with np.errstate(invalid='ignore', divide='ignore'):
+                correlation = daily_stats['working_hours'].corr(daily_stats['avg_efficiency'])
             if correlation < -0.3:  # Strong negative correlation indicates fatigue
                 return int(daily_stats['working_hours'].quantile(0.7))  # 70th percentile
         
@@ -291,6 +293,9 @@ class DigitalTwinAgent:
     
     def visualize_driver_profile(self, driver_profile: DriverProfile):
         """Create comprehensive visualization of driver profile"""
+        # Imported here so the agent's scoring/simulation API doesn't pay for matplotlib
+        import matplotlib.pyplot as plt
+        
         fig, axes = plt.subplots(2, 3, figsize=(18, 12))
         
         # 1. Preferred hours heatmap
@@ -1,11 +1,17 @@
 # Event Intelligence Agent - Production Version
 
+import asyncio
+import hashlib
 import requests
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import json
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from datetime import datetime
+import orjson
+import re
+import threading
+import time
+from types import MappingProxyType
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from openai import OpenAI
 import os
 from dotenv import load_dotenv
@@ -19,7 +25,7 @@ load_dotenv()
 CITY = "New York"
 HOURS_AHEAD = 12
 PEAK_THRESHOLD = 500
-USE_DEMO_MODE = True
+USE_DEMO_MODE = True  # serve the canned analysis instead of calling the model
 
 GPT_API_KEY = os.getenv("GPT_API_KEY")
 GPT_MODEL = "gpt-3.5-turbo"
@@ -30,6 +36,21 @@ POST_EVENT_DELAY_MINUTES = 15
 AVG_EVENT_FARE = 150
 WAITING_COST_PER_MINUTE = 0.8
 
+# Private generator for demo event sampling (no global NumPy RNG state)
+_RNG = np.random.default_rng()
+
+# Recommendations are reused for this long before events are regenerated/re-analyzed
+RECOMMENDATION_CACHE_TTL_SECONDS = 30
+
+# Model calls from concurrent async requests are collected for up to this long
+# (or this many prompts) and sent out together
+BATCH_WINDOW_SECONDS = 0.2
+BATCH_MAX_PROMPTS = 50
+
+# Model responses are reused for identical prompts (events change only every few minutes)
+PROMPT_CACHE_SIZE = 256
+PROMPT_CACHE_TTL_SECONDS = 300
+
 DEMO_VENUES = {
     "New York": [
         {"name": "Madison Square Garden", "lat": 40.7505, "lng": -73.9934, "capacity": 20000},
@@ -42,6 +63,77 @@ DEMO_VENUES = {
     ]
 }
 
+# Large pool of realistic demo events, built once at import (read-only views)
+EVENT_POOL = tuple(MappingProxyType(event) for event in [
+    # Sports
+    {"type": "sports", "name": "Knicks vs Lakers", "venue": "Madison Square Garden", "duration": 150, "capacity_fill": 0.85},
+    {"type": "sports", "name": "Rangers vs Bruins", "venue": "Madison Square Garden", "duration": 180, "capacity_fill": 0.80},
+    {"type": "sports", "name": "Nets vs Celtics", "venue": "Barclays Center", "duration": 150, "capacity_fill": 0.75},
+    {"type": "sports", "name": "Yankees vs Red Sox", "venue": "Yankee Stadium", "duration": 180, "capacity_fill": 0.90},
+    {"type": "sports", "name": "Liberty Basketball", "venue": "Barclays Center", "duration": 120, "capacity_fill": 0.60},
+    
+    # Concerts - Big
+    {"type": "concerts", "name": "Taylor Swift - Eras Tour", "venue": "Madison Square Garden", "duration": 180, "capacity_fill": 1.0},
+    {"type": "concerts", "name": "The Weeknd Live", "venue": "Barclays Center", "duration": 150, "capacity_fill": 0.95},
+    {"type": "concerts", "name": "Beyoncé Concert", "venue": "Madison Square Garden", "duration": 165, "capacity_fill": 1.0},
+    {"type": "concerts", "name": "Drake World Tour", "venue": "Barclays Center", "duration": 150, "capacity_fill": 0.90},
+    
+    # Concerts - Medium
+    {"type": "concerts", "name": "Indie Rock Night", "venue": "Radio City Music Hall", "duration": 120, "capacity_fill": 0.70},
+    {"type": "concerts", "name": "Jazz Performance", "venue": "Radio City Music Hall", "duration": 90, "capacity_fill": 0.65},
+    {"type": "concerts", "name": "Electronic Music Festival", "venue": "Brooklyn Steel", "duration": 240, "capacity_fill": 0.85},
+    {"type": "concerts", "name": "Hip Hop Showcase", "venue": "Terminal 5", "duration": 150, "capacity_fill": 0.75},
+    {"type": "concerts", "name": "Alternative Band Tour", "venue": "Webster Hall", "duration": 120, "capacity_fill": 0.80},
+    
+    # Theater & Shows
+    {"type": "performing-arts", "name": "Broadway Musical", "venue": "Radio City Music Hall", "duration": 150, "capacity_fill": 0.85},
+    {"type": "performing-arts", "name": "Comedy Show", "venue": "Madison Square Garden", "duration": 120, "capacity_fill": 0.70},
+    {"type": "performing-arts", "name": "Stand-up Comedy Night", "venue": "Webster Hall", "duration": 90, "capacity_fill": 0.60},
+    
+    # Conferences
+    {"type": "conferences", "name": "Tech Summit NYC", "venue": "Barclays Center", "duration": 480, "capacity_fill": 0.50},
+    {"type": "conferences", "name": "Marketing Conference", "venue": "Madison Square Garden", "duration": 360, "capacity_fill": 0.45},
+    {"type": "conferences", "name": "Startup Meetup", "venue": "Terminal 5", "duration": 180, "capacity_fill": 0.40},
+])
+
+# Markdown code-fence lines (```json ... ```) wrapped around the model's JSON answer
+_FENCE_LINE_RE = re.compile(r"^[ \t]*```.*$", re.MULTILINE)
+
+# Canned analysis served in demo mode and when the AI call fails
+# (callers get fresh dict copies, so these are never mutated)
+_MOCK_PEAKS = (
+    {
+        "time_window": "14:00-14:30",
+        "event_name": "Knicks vs Lakers",
+        "venue_name": "Madison Square Garden",
+        "estimated_attendees": 20000,
+        "priority": "high"
+    },
+    {
+        "time_window": "19:00-19:30",
+        "event_name": "Taylor Swift Concert",
+        "venue_name": "Madison Square Garden",
+        "estimated_attendees": 20000,
+        "priority": "high"
+    },
+    {
+        "time_window": "20:00-20:30",
+        "event_name": "Broadway Show",
+        "venue_name": "Radio City Music Hall",
+        "estimated_attendees": 6000,
+        "priority": "medium"
+    }
+)
+
+_MOCK_RECOMMENDATION = {
+    "action": "go",
+    "target_peak": "14:00-14:30",
+    "reasoning": "High attendance event",
+    "expected_revenue": 45,
+    "waiting_time_minutes": 15,
+    "confidence": 0.9
+}
+
 class EventAIAgentConfig:
     def __init__(self, city: str, hours_ahead: int):
         self.gpt_api_key = GPT_API_KEY
@@ -54,6 +146,7 @@ class EventAIAgentConfig:
         self.waiting_cost_per_minute = WAITING_COST_PER_MINUTE
         self.temperature = TEMPERATURE
         self.max_tokens = MAX_TOKENS
+        self.use_demo_mode = USE_DEMO_MODE
         self.system_prompt = "You are an AI agent specialized in revenue optimization for Uber drivers. Respond ONLY in valid JSON."
 
 config = EventAIAgentConfig(city=CITY, hours_ahead=HOURS_AHEAD)
@@ -63,78 +156,50 @@ class DemoEventGenerator:
         self.city = city
         self.hours_ahead = hours_ahead
         self.venues = DEMO_VENUES.get(city, [])
+        self.venues_by_name = {v["name"]: v for v in self.venues}
+        self._default_venue = self.venues[0] if self.venues else None
     
     def generate_events(self) -> List[Dict]:
         """Generate realistic events from a pool of possibilities"""
-        now = datetime.now()
+        now_ts = int(time.time())
         events = []
         
-        # Large pool of realistic events
-        event_pool = [
-            # Sports
-            {"type": "sports", "name": "Knicks vs Lakers", "venue": "Madison Square Garden", "duration": 150, "capacity_fill": 0.85},
-            {"type": "sports", "name": "Rangers vs Bruins", "venue": "Madison Square Garden", "duration": 180, "capacity_fill": 0.80},
-            {"type": "sports", "name": "Nets vs Celtics", "venue": "Barclays Center", "duration": 150, "capacity_fill": 0.75},
-            {"type": "sports", "name": "Yankees vs Red Sox", "venue": "Yankee Stadium", "duration": 180, "capacity_fill": 0.90},
-            {"type": "sports", "name": "Liberty Basketball", "venue": "Barclays Center", "duration": 120, "capacity_fill": 0.60},
-            
-            # Concerts - Big
-            {"type": "concerts", "name": "Taylor Swift - Eras Tour", "venue": "Madison Square Garden", "duration": 180, "capacity_fill": 1.0},
-            {"type": "concerts", "name": "The Weeknd Live", "venue": "Barclays Center", "duration": 150, "capacity_fill": 0.95},
-            {"type": "concerts", "name": "Beyoncé Concert", "venue": "Madison Square Garden", "duration": 165, "capacity_fill": 1.0},
-            {"type": "concerts", "name": "Drake World Tour", "venue": "Barclays Center", "duration": 150, "capacity_fill": 0.90},
-            
-            # Concerts - Medium
-            {"type": "concerts", "name": "Indie Rock Night", "venue": "Radio City Music Hall", "duration": 120, "capacity_fill": 0.70},
-            {"type": "concerts", "name": "Jazz Performance", "venue": "Radio City Music Hall", "duration": 90, "capacity_fill": 0.65},
-            {"type": "concerts", "name": "Electronic Music Festival", "venue": "Brooklyn Steel", "duration": 240, "capacity_fill": 0.85},
-            {"type": "concerts", "name": "Hip Hop Showcase", "venue": "Terminal 5", "duration": 150, "capacity_fill": 0.75},
-            {"type": "concerts", "name": "Alternative Band Tour", "venue": "Webster Hall", "duration": 120, "capacity_fill": 0.80},
-            
-            # Theater & Shows
-            {"type": "performing-arts", "name": "Broadway Musical", "venue": "Radio City Music Hall", "duration": 150, "capacity_fill": 0.85},
-            {"type": "performing-arts", "name": "Comedy Show", "venue": "Madison Square Garden", "duration": 120, "capacity_fill": 0.70},
-            {"type": "performing-arts", "name": "Stand-up Comedy Night", "venue": "Webster Hall", "duration": 90, "capacity_fill": 0.60},
-            
-            # Conferences
-            {"type": "conferences", "name": "Tech Summit NYC", "venue": "Barclays Center", "duration": 480, "capacity_fill": 0.50},
-            {"type": "conferences", "name": "Marketing Conference", "venue": "Madison Square Garden", "duration": 360, "capacity_fill": 0.45},
-            {"type": "conferences", "name": "Startup Meetup", "venue": "Terminal 5", "duration": 180, "capacity_fill": 0.40},
-        ]
-        
         # Randomly select 4-8 events that happen today
-        num_events = np.random.randint(4, 9)
-        selected_events = np.random.choice(event_pool, size=min(num_events, len(event_pool)), replace=False)
+        # (sample integer indices rather than letting NumPy box the dicts into an object array)
+        num_events = _RNG.integers(4, 9)
+        selected_idx = _RNG.choice(len(EVENT_POOL), size=min(num_events, len(EVENT_POOL)), replace=False)
+        selected_events = [EVENT_POOL[i] for i in selected_idx]
+        venues = [self.venues_by_name.get(e["venue"], self._default_venue) for e in selected_events]
         
-        for i, event_data in enumerate(selected_events):
-            # Find the venue details
-            venue = next((v for v in self.venues if v["name"] == event_data["venue"]), self.venues[0])
-            
-            # Generate realistic start time within analysis window
-            # Simple approach: random offset between 1 hour and hours_ahead
-            hours_offset = np.random.uniform(1, self.hours_ahead)
-            start_time = now + timedelta(hours=hours_offset)
-            
-            # Round to nearest 15 minutes for realism
-            minute = (start_time.minute // 15) * 15
-            start_time = start_time.replace(minute=minute, second=0, microsecond=0)
-            
+        # Per-event numeric fields as parallel arrays, converted to dicts only at the end
+        # Generate realistic start times (epoch seconds) within analysis window
+        # Simple approach: random offset between 1 hour and hours_ahead,
+        # rounded down to 15 minutes for realism. Offsets are sorted up front
+        # so events come out already in start-time order.
+        start_offsets = np.sort(_RNG.uniform(3600, self.hours_ahead * 3600, size=len(selected_events)))
+        start_times = (now_ts + start_offsets.astype(np.int64)) // 900 * 900
+        
+        # Calculate attendees
+        capacities = np.array([v["capacity"] for v in venues], dtype=np.float64)
+        fills = np.array([e["capacity_fill"] for e in selected_events], dtype=np.float64)
+        attendees = (capacities * fills).astype(np.int64)
+        phq_ranks = np.minimum(attendees // 200 + 40, 95)
+        
+        rows = zip(selected_events, venues, start_times.tolist(), attendees.tolist(), phq_ranks.tolist())
+        for i, (event_data, venue, start_ts, estimated_attendees, phq_rank) in enumerate(rows):
             # Double check it's in the future
-            if start_time <= now:
+            if start_ts <= now_ts:
                 continue
             
-            # Calculate attendees
-            estimated_attendees = int(venue["capacity"] * event_data["capacity_fill"])
-            
             events.append({
-                'event_id': f'event_{i}_{int(start_time.timestamp())}',
+                'event_id': f'event_{i}_{start_ts}',
                 'name': event_data["name"],
                 'type': event_data["type"],
                 'venue_name': venue["name"],
-                'start_time': start_time,
+                'start_ts': start_ts,
                 'estimated_duration_minutes': event_data["duration"],
                 'estimated_attendees': estimated_attendees,
-                'phq_rank': min(int((estimated_attendees / 200) + 40), 95),
+                'phq_rank': phq_rank,
                 'location': {
                     'lat': venue["lat"],
                     'lng': venue["lng"],
@@ -143,19 +208,171 @@ class DemoEventGenerator:
                 'labels': [event_data["type"]]
             })
         
-        # Sort by start time
-        events.sort(key=lambda x: x['start_time'])
-        
         return events
     
+class PromptBatcher:
+    """
+    Collects prompts submitted by concurrent requests and sends them to the model
+    together. The queue is drained every BATCH_WINDOW_SECONDS (or as soon as
+    BATCH_MAX_PROMPTS are waiting); identical prompts in a batch share a single
+    call, and the distinct ones go out concurrently over one shared client
+    connection pool. Each submitter awaits a future resolved with its answer.
+    """
+    
+    def __init__(self, complete: Callable[[str], Awaitable[str]],
+                 window_seconds: float = BATCH_WINDOW_SECONDS,
+                 max_prompts: int = BATCH_MAX_PROMPTS):
+        self._complete = complete
+        self.window_seconds = window_seconds
+        self.max_prompts = max_prompts
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+    
+    def start(self):
+        """Start the drain loop on the running event loop (no-op if already running)"""
+        if self._runner is None or self._runner.done():
+            self._queue = asyncio.Queue()
+            self._runner = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+    
+    async def submit(self, prompt: str) -> str:
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, future))
+        return await future
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window_seconds
+            while len(batch) < self.max_prompts:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            
+            # Flush in the background so a slow model call doesn't hold up the next window
+            flush = asyncio.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+    
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]):
+        waiters: Dict[str, List[asyncio.Future]] = {}
+        for prompt, future in batch:
+            waiters.setdefault(prompt, []).append(future)
+        
+        results = await asyncio.gather(*(self._complete(p) for p in waiters), return_exceptions=True)
+        for futures, result in zip(waiters.values(), results):
+            for future in futures:
+                if future.done():
+                    continue  # submitter gave up (cancelled)
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+class PromptCache:
+    """LRU of model responses keyed on a hash of the full chat request, with a TTL"""
+    
+    def __init__(self, max_entries: int = PROMPT_CACHE_SIZE, ttl_seconds: float = PROMPT_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(request: Dict) -> str:
+        payload = orjson.dumps(request, option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+    
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() > entry[0]:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def put(self, key: str, response: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
 class EventIntelligenceAgent:
     def __init__(self, config: EventAIAgentConfig):
         self.config = config
         self.agent_id = f"event_agent_{config.city.lower().replace(' ', '_')}"
         self.gpt_client = OpenAI(api_key=config.gpt_api_key)
         self.demo_generator = DemoEventGenerator(config.city, config.hours_ahead)
+        self._cache: Dict[Tuple[str, str, int], Tuple[float, Dict]] = {}
+        self._cache_lock = threading.Lock()
+        self._async_gpt_client = None
+        self.batcher = PromptBatcher(self._complete_async)
+        self.prompt_cache = PromptCache()
+    
+    @property
+    def async_gpt_client(self):
+        if self._async_gpt_client is None:
+            from openai import AsyncOpenAI
+            self._async_gpt_client = AsyncOpenAI(api_key=self.config.gpt_api_key)
+        return self._async_gpt_client
+    
+    def _cache_lookup(self, kind: str) -> Tuple[Tuple[str, str, int], Optional[Dict]]:
+        """(key, cached value or None) for kind, honoring RECOMMENDATION_CACHE_TTL_SECONDS"""
+        key = (kind, self.config.city, self.config.hours_ahead)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= RECOMMENDATION_CACHE_TTL_SECONDS:
+                return key, entry[1]
+        return key, None
+    
+    def _cache_store(self, key: Tuple[str, str, int], value: Dict):
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic(), value)
+    
+    def _cached(self, kind: str, compute: Callable[[], Dict]) -> Dict:
+        """Return compute() memoized for RECOMMENDATION_CACHE_TTL_SECONDS per (kind, city, hours_ahead)"""
+        key, value = self._cache_lookup(kind)
+        if value is None:
+            value = compute()
+            self._cache_store(key, value)
+        return value
+    
+    async def _cached_async(self, kind: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Async counterpart of _cached (same cache entries)"""
+        key, value = self._cache_lookup(kind)
+        if value is None:
+            value = await compute()
+            self._cache_store(key, value)
+        return value
     
     def get_recommendation(self) -> Dict:
+        return self._cached("recommendation", self._compute_recommendation)
+    
+    def get_orchestrator_message(self) -> Dict:
+        """Recommendation already formatted for the orchestrator (cached like get_recommendation)"""
+        return self._cached(
+            "orchestrator_message",
+            lambda: AgentMessage.format_for_orchestrator(self.agent_id, self.get_recommendation())
+        )
+    
+    def _compute_recommendation(self) -> Dict:
         events = self.demo_generator.generate_events()
         
         if not events:
@@ -163,141 +380,134 @@ class EventIntelligenceAgent:
         
         return self.analyze_with_ai(events)
     
-    def analyze_with_ai(self, events_data: List[Dict]) -> Dict:
-        now = datetime.now()
+    async def get_recommendation_async(self) -> Dict:
+        return await self._cached_async("recommendation", self._compute_recommendation_async)
+    
+    async def get_orchestrator_message_async(self) -> Dict:
+        """Async get_orchestrator_message: the model call goes through the PromptBatcher"""
+        async def compute() -> Dict:
+            return AgentMessage.format_for_orchestrator(self.agent_id, await self.get_recommendation_async())
+        return await self._cached_async("orchestrator_message", compute)
+    
+    async def _compute_recommendation_async(self) -> Dict:
+        events = self.demo_generator.generate_events()
+        
+        if not events:
+            return {"status": "no_events", "city": self.config.city, "message": "No events"}
         
+        return await self.analyze_with_ai_async(events)
+    
+    def _build_user_prompt(self, events_data: List[Dict]) -> str:
         events_summary = []
         for event in events_data[:20]:
-            end_time = event['start_time'] + timedelta(minutes=event['estimated_duration_minutes'])
-            peak_time = end_time + timedelta(minutes=self.config.post_event_delay_minutes)
+            end_ts = event['start_ts'] + event['estimated_duration_minutes'] * 60
+            peak_ts = end_ts + self.config.post_event_delay_minutes * 60
             
             events_summary.append({
                 'event': event['name'],
                 'venue': event['venue_name'],
-                'end_time': end_time.strftime('%H:%M'),
-                'peak_time': peak_time.strftime('%H:%M'),
+                'end_time': time.strftime('%H:%M', time.localtime(end_ts)),
+                'peak_time': time.strftime('%H:%M', time.localtime(peak_ts)),
                 'attendees': event['estimated_attendees']
             })
         
-        user_prompt = f"""Events in {self.config.city}:
-{json.dumps(events_summary, indent=2)}
+        return f"""Events in {self.config.city}:
+{orjson.dumps(events_summary).decode()}
 
 Identify ALL event peaks (end time + 15min). Respond in JSON:
 {{"peaks_identified": [{{"time_window": "23:00-23:30", "event_name": "Concert", "venue_name": "MSG", "estimated_attendees": 20000, "priority": "high"}}],
 "recommendation": {{"action": "go", "target_peak": "23:00-23:30", "reasoning": "Large event", "expected_revenue": 45, "waiting_time_minutes": 15, "confidence": 0.88}},
 "analysis": "Summary"}}"""
-
-        # Force mock data for testing
-        if True:  # Change to False to use real AI
+    
+    def _chat_request(self, user_prompt: str) -> Dict:
+        return {
+            "model": self.config.gpt_model,
+            "messages": [{"role": "system", "content": self.config.system_prompt}, {"role": "user", "content": user_prompt}],
+            "temperature": self.config.temperature,
+            "max_tokens": self.config.max_tokens
+        }
+    
+    async def _complete_async(self, user_prompt: str) -> str:
+        """One model call on the shared async client (used by the PromptBatcher)"""
+        chat_completion = await self.async_gpt_client.chat.completions.create(**self._chat_request(user_prompt))
+        return chat_completion.choices[0].message.content
+    
+    def _parse_ai_analysis(self, ai_response: str, events_data: List[Dict], now: datetime) -> Dict:
+        cleaned = ai_response.strip()
+        if cleaned.startswith('```'):
+            cleaned = _FENCE_LINE_RE.sub('', cleaned)
+        
+        json_start = cleaned.find('{')
+        json_end = cleaned.rfind('}') + 1
+        ai_analysis = orjson.loads(cleaned[json_start:json_end])
+        ai_analysis['agent_id'] = self.agent_id
+        ai_analysis['city'] = self.config.city
+        ai_analysis['timestamp'] = now.isoformat()
+        ai_analysis['total_events_analyzed'] = len(events_data)
+        ai_analysis['avg_event_fare'] = self.config.avg_event_fare
+        return ai_analysis
+    
+    def _build_mock_response(self, now: datetime) -> Dict:
+        """Mock events, returned in demo mode and when the AI call fails"""
+        return {
+            "peaks_identified": [dict(peak) for peak in _MOCK_PEAKS],
+            "recommendation": dict(_MOCK_RECOMMENDATION),
+            "analysis": "Mock events for testing",
+            "agent_id": self.agent_id,
+            "city": self.config.city,
+            "timestamp": now.isoformat(),
+            "total_events_analyzed": len(_MOCK_PEAKS),
+            "avg_event_fare": self.config.avg_event_fare
+        }
+    
+    def analyze_with_ai(self, events_data: List[Dict]) -> Dict:
+        now = datetime.now()
+        if self.config.use_demo_mode:
+            return self._build_mock_response(now)
+        
+        user_prompt = self._build_user_prompt(events_data)
+        try:
+            request = self._chat_request(user_prompt)
+            key = PromptCache.key(request)
+            ai_response = self.prompt_cache.get(key)
+            from_cache = ai_response is not None
+            if not from_cache:
+                chat_completion = self.gpt_client.chat.completions.create(**request)
+                ai_response = chat_completion.choices[0].message.content
+            analysis = self._parse_ai_analysis(ai_response, events_data, now)
+            # Only store fresh responses, so a hit never extends the entry's TTL
+            if not from_cache:
+                self.prompt_cache.put(key, ai_response)
+            return analysis
+        except Exception:
             # Return mock events when AI fails
-            mock_peaks = [
-                {
-                    "time_window": "14:00-14:30",
-                    "event_name": "Knicks vs Lakers",
-                    "venue_name": "Madison Square Garden",
-                    "estimated_attendees": 20000,
-                    "priority": "high"
-                },
-                {
-                    "time_window": "19:00-19:30", 
-                    "event_name": "Taylor Swift Concert",
-                    "venue_name": "Madison Square Garden",
-                    "estimated_attendees": 20000,
-                    "priority": "high"
-                },
-                {
-                    "time_window": "20:00-20:30",
-                    "event_name": "Broadway Show",
-                    "venue_name": "Radio City Music Hall", 
-                    "estimated_attendees": 6000,
-                    "priority": "medium"
-                }
-            ]
-            
-            return {
-                "peaks_identified": mock_peaks,
-                "recommendation": {
-                    "action": "go",
-                    "target_peak": "14:00-14:30",
-                    "reasoning": "High attendance event",
-                    "expected_revenue": 45,
-                    "waiting_time_minutes": 15,
-                    "confidence": 0.9
-                },
-                "analysis": "Mock events for testing",
-                "agent_id": self.agent_id,
-                "city": self.config.city,
-                "timestamp": now.isoformat(),
-                "total_events_analyzed": len(mock_peaks),
-                "avg_event_fare": self.config.avg_event_fare
-            }
+            return self._build_mock_response(now)
+    
+    async def analyze_with_ai_async(self, events_data: List[Dict]) -> Dict:
+        """Same as analyze_with_ai, but the model call is batched with concurrent requests"""
+        now = datetime.now()
+        if self.config.use_demo_mode:
+            return self._build_mock_response(now)
         
+        user_prompt = self._build_user_prompt(events_data)
         try:
-            chat_completion = self.gpt_client.chat.completions.create(
-                model=self.config.gpt_model,
-                messages=[{"role": "system", "content": self.config.system_prompt}, {"role": "user", "content": user_prompt}],
-                temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
-            )
-            
-            ai_response = chat_completion.choices[0].message.content
-            cleaned = ai_response.strip()
-            if cleaned.startswith('```'):
-                lines = cleaned.split('\n')
-                cleaned = '\n'.join([l for l in lines if not l.strip().startswith('```')])
-            
-            json_start = cleaned.find('{')
-            json_end = cleaned.rfind('}') + 1
-            ai_analysis = json.loads(cleaned[json_start:json_end])
-            ai_analysis['agent_id'] = self.agent_id
-            ai_analysis['city'] = self.config.city
-            ai_analysis['timestamp'] = now.isoformat()
-            ai_analysis['total_events_analyzed'] = len(events_data)
-            ai_analysis['avg_event_fare'] = self.config.avg_event_fare
-            return ai_analysis
-        except:
+            key = PromptCache.key(self._chat_request(user_prompt))
+            ai_response = self.prompt_cache.get(key)
+            from_cache = ai_response is not None
+            if not from_cache:
+                ai_response = await self.batcher.submit(user_prompt)
+            analysis = self._parse_ai_analysis(ai_response, events_data, now)
+            # Only store fresh responses, so a hit never extends the entry's TTL
+            if not from_cache:
+                self.prompt_cache.put(key, ai_response)
+            return analysis
+        except Exception:
             # Return mock events when AI fails
-            mock_peaks = [
-                {
-                    "time_window": "14:00-14:30",
-                    "event_name": "Knicks vs Lakers",
-                    "venue_name": "Madison Square Garden",
-                    "estimated_attendees": 20000,
-                    "priority": "high"
-                },
-                {
-                    "time_window": "19:00-19:30", 
-                    "event_name": "Taylor Swift Concert",
-                    "venue_name": "Madison Square Garden",
-                    "estimated_attendees": 20000,
-                    "priority": "high"
-                },
-                {
-                    "time_window": "20:00-20:30",
-                    "event_name": "Broadway Show",
-                    "venue_name": "Radio City Music Hall", 
-                    "estimated_attendees": 6000,
-                    "priority": "medium"
-                }
-            ]
-            
-            return {
-                "peaks_identified": mock_peaks,
-                "recommendation": {
-                    "action": "go",
-                    "target_peak": "14:00-14:30",
-                    "reasoning": "High attendance event",
-                    "expected_revenue": 45,
-                    "waiting_time_minutes": 15,
-                    "confidence": 0.9
-                },
-                "analysis": "Mock events for testing",
-                "agent_id": self.agent_id,
-                "city": self.config.city,
-                "timestamp": now.isoformat(),
-                "total_events_analyzed": len(mock_peaks),
-                "avg_event_fare": self.config.avg_event_fare
-            }
+            return self._build_mock_response(now)
+
+def _global_priority(revenue: float, waiting_time_minutes: float, confidence: float) -> float:
+    """Revenue per minute waited, scaled by confidence and clamped to [0, 1]"""
+    return min(max((revenue / max(waiting_time_minutes, 1)) * confidence / 100, 0), 1)
 
 class AgentMessage:
     @staticmethod
@@ -308,22 +518,22 @@ class AgentMessage:
         rec = recommendation.get('recommendation', {})
         all_peaks = recommendation.get('peaks_identified', [])
         
-        confidence = rec.get('confidence', 0.5)
-        revenue = rec.get('expected_revenue', 0)
-        wait_time = max(rec.get('waiting_time_minutes', 60), 1)
-        global_priority = min(max((revenue / wait_time) * confidence / 100, 0), 1)
+        global_priority = _global_priority(
+            rec.get('expected_revenue', 0), rec.get('waiting_time_minutes', 60), rec.get('confidence', 0.5)
+        )
         
-        formatted_peaks = []
-        for i, peak in enumerate(all_peaks):
-            formatted_peaks.append({
-                "peak_id": f"{agent_id}_peak_{i+1}",
+        formatted_peaks = [
+            {
+                "peak_id": f"{agent_id}_peak_{i}",
                 "time_window": peak.get('time_window', 'N/A'),
                 "event_name": peak.get('event_name', 'N/A'),
                 "venue_name": peak.get('venue_name', 'N/A'),
                 "estimated_attendees": peak.get('estimated_attendees', 0),
                 "priority": peak.get('priority', 'medium'),
-                "is_recommended": (i == 0)
-            })
+                "is_recommended": i == 1
+            }
+            for i, peak in enumerate(all_peaks, 1)
+        ]
         
         return {
             "agent_id": agent_id,
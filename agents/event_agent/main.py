@@ -1,19 +1,23 @@
 # main_event_agent.py
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 import os
 import json
-from event_agent import EventIntelligenceAgent, EventAIAgentConfig, AgentMessage  # ton code agent
+import orjson
+import uvicorn
+from event_agent import EventIntelligenceAgent, EventAIAgentConfig  # ton code agent
 from fastapi.middleware.cors import CORSMiddleware
 
 # =======================
 # Configuration FastAPI
 # =======================
 
-app = FastAPI(title="Event Intelligence API", version="1.0")
+# orjson serializes the nested peaks/recommendation payloads much faster than stdlib json
+app = FastAPI(title="Event Intelligence API", version="1.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -45,23 +49,29 @@ class AnalyzeRequest(BaseModel):
 def root():
     return {"message": "Event Intelligence API is running."}
 
+@app.on_event("startup")
+async def start_batcher():
+    agent.batcher.start()
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await agent.batcher.stop()
+
 @app.post("/analyze")
-def analyze(request: AnalyzeRequest):
+async def analyze(request: AnalyzeRequest):
     try:
         if request.city != CITY:
             raise HTTPException(status_code=400, detail=f"Only {CITY} is supported.")
         
-        recommendation = agent.get_recommendation()
-        formatted = AgentMessage.format_for_orchestrator(agent.agent_id, recommendation)
+        formatted = await agent.get_orchestrator_message_async()
         return formatted
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 @app.get("/all_events")
-def all_events():
+async def all_events():
     try:
-        recommendation = agent.get_recommendation()
-        formatted = AgentMessage.format_for_orchestrator(agent.agent_id, recommendation)
+        formatted = await agent.get_orchestrator_message_async()
         return {
             "city": CITY,
             "timestamp": datetime.now().isoformat(),
@@ -70,4 +80,22 @@ def all_events():
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/all_events/stream")
+async def all_events_stream():
+    """Same peaks as /all_events, as NDJSON (one peak per line) so clients can start on the first one"""
+    try:
+        formatted = await agent.get_orchestrator_message_async()
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+    
+    async def peak_lines():
+        for peak in formatted.get("all_peaks", []):
+            yield orjson.dumps(peak) + b"\n"
+    
+    return StreamingResponse(peak_lines(), media_type="application/x-ndjson")
 
+if __name__ == "__main__":
+    # Single worker on purpose: the prompt batcher and the recommendation caches live
+    # in-process, so concurrency comes from the event loop rather than extra processes
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "1001")),
+                workers=1, loop="uvloop", http="httptools")
@@ -1,9 +1,13 @@
 # main_orchestrator_agent.py
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional
+import os
+import threading
 import uvicorn
+from collections import OrderedDict
 import json
 from datetime import datetime
 from orchestrator import OrchestratorAgent, OrchestratorConfig  # Assure-toi que le chemin est correct
@@ -11,7 +15,8 @@ from orchestrator import OrchestratorAgent, OrchestratorConfig  # Assure-toi que
 # =======================================================
 # CONFIGURATION FASTAPI
 # =======================================================
-app = FastAPI(title="Orchestrator Intelligence Agent API")
+# orjson serializes the nested recommendation payloads much faster than stdlib json
+app = FastAPI(title="Orchestrator Intelligence Agent API", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +33,24 @@ class OrchestratorRequest(BaseModel):
     driver_id: Optional[str] = "E10156"
     wellbeing_score: Optional[float] = 85.0
 
+# One agent (and so one OpenAI client / connection pool) per city, reused across requests.
+# city comes from the client, so keep only the most recently used few
+MAX_CACHED_AGENTS = 8
+_AGENTS: "OrderedDict[str, OrchestratorAgent]" = OrderedDict()
+_AGENTS_LOCK = threading.Lock()
+
+def _get_agent(city: str) -> OrchestratorAgent:
+    with _AGENTS_LOCK:
+        agent = _AGENTS.get(city)
+        if agent is None:
+            agent = OrchestratorAgent(OrchestratorConfig(city=city))
+            _AGENTS[city] = agent
+            if len(_AGENTS) > MAX_CACHED_AGENTS:
+                _AGENTS.popitem(last=False)
+        else:
+            _AGENTS.move_to_end(city)
+        return agent
+
 @app.get("/")
 def root():
     return {"status": "Orchestrator Intelligence Agent is running"}
@@ -38,8 +61,7 @@ def orchestrate(req: OrchestratorRequest):
     driver_id = req.driver_id or "E10156"
     wellbeing_score = req.wellbeing_score if req.wellbeing_score is not None else 85.0
     
-    config = OrchestratorConfig(city=city)
-    agent = OrchestratorAgent(config)
+    agent = _get_agent(city)
     
     try:
         recommendation = agent.get_orchestrated_recommendation(
@@ -50,4 +72,6 @@ def orchestrate(req: OrchestratorRequest):
     except Exception as e:
         return {"status": "error", "error": str(e), "timestamp": datetime.now().isoformat()}
 
-
+if __name__ == "__main__":
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", "1003")),
+                workers=os.cpu_count() or 1, loop="uvloop", http="httptools")
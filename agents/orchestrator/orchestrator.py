@@ -1,13 +1,34 @@
 # Orchestrator Intelligence Agent - Production Version with Weather Integration
 
 import json
+import orjson
+import re
 import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+import httpx
 from openai import OpenAI
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
 from dotenv import load_dotenv
 
+# Resolved once at import; the module still loads when the weather agent is absent,
+# in which case get_weather_agent_data reports the error as before
+try:
+    from weather_agent import WeatherAgent
+except ImportError:
+    try:
+        from agents.weather_agent.weather_agent import WeatherAgent
+    except ImportError:
+        WeatherAgent = None
+
 load_dotenv()
 
 # ============================================================================
@@ -29,8 +50,193 @@ MAX_PLANNING_HOURS = 12
 TRAVEL_BUFFER_MINUTES = 10
 TURNAROUND_TIME_MINUTES = 5
 
+# Up to this many viable peaks the route is planned exactly in-process instead of by the model
+FAST_PATH_MAX_PEAKS = 8
+PLANNER_TRAVEL_COST_PER_MINUTE = 0.5
+PLANNER_WAIT_COST_PER_MINUTE = 0.3
+
+# Keep-alive session for the local agent APIs (sockets are reused across orchestrations)
+_SESSION = requests.Session()
+_SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=Retry(total=2, backoff_factor=0.1)))
+
+# Numeric score per peak priority (unknown priorities score 0.5)
+PRIORITY_SCORES = {
+    'high': 0.9,
+    'medium': 0.6,
+    'low': 0.3
+}
+
+# Known venue / airport coordinates as (lat, lng)
+VENUE_LOCATIONS = {
+    "Madison Square Garden": (40.7505, -73.9934),
+    "Barclays Center": (40.6826, -73.9754),
+    "Yankee Stadium": (40.8296, -73.9262),
+    "Radio City Music Hall": (40.7599, -73.9799),
+    "Brooklyn Steel": (40.7183, -73.9571),
+    "Terminal 5": (40.7677, -73.9887),
+    "Webster Hall": (40.7298, -73.9891)
+}
+DEFAULT_VENUE_LOCATION = (40.7580, -73.9855)  # unknown venues: Times Square
+
+AIRPORT_LOCATIONS = {
+    'JFK': (40.6413, -73.7781),
+    'LGA': (40.7769, -73.8740),
+    'EWR': (40.6895, -74.1745)
+}
+AIRPORT_NAMES = {'JFK': 'JFK Airport', 'LGA': 'LaGuardia Airport', 'EWR': 'Newark Airport'}
+
+# Row-per-location coordinate arrays for the vectorized distance calculation
+_VENUE_INDEX = {name: i for i, name in enumerate(VENUE_LOCATIONS)}
+_DEFAULT_VENUE_INDEX = len(VENUE_LOCATIONS)
+_VENUE_COORDS = np.array(list(VENUE_LOCATIONS.values()) + [DEFAULT_VENUE_LOCATION], dtype=np.float64)
+
+_AIRPORT_CODES = tuple(AIRPORT_LOCATIONS)
+_AIRPORT_INDEX = {code: i for i, code in enumerate(_AIRPORT_CODES)}
+_AIRPORT_COORDS = np.array(list(AIRPORT_LOCATIONS.values()), dtype=np.float64)
+
+# Weather analyses keyed by (city, hour bucket since the epoch)
+_WEATHER_CACHE: Dict[Tuple[str, int], Dict] = {}
+_WEATHER_CACHE_LOCK = threading.Lock()
+
+# Shared OpenAI clients keyed by API key (see _get_gpt_client)
+GPT_MAX_CONNECTIONS = 10
+_GPT_CLIENTS: Dict[Optional[str], OpenAI] = {}
+_GPT_CLIENTS_LOCK = threading.Lock()
+
+# Markdown code-fence lines (```json ... ```) and control characters stripped from the model's answer
+_FENCE_LINE_RE = re.compile(r"^[ \t]*```.*$", re.MULTILINE)
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x1f\x7f-\x9f]')
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+
+# Fixed planning instructions and response schema. They are sent as part of the
+# system message, ahead of the per-request data, so every call shares the same long
+# prompt prefix and the provider's automatic prompt caching can reuse it.
+PLAN_INSTRUCTIONS = """
+CRITICAL INSTRUCTIONS:
+1. Use ONLY the actual weather data provided in the request
+2. For weather_conditions field, copy the 'weather' value of the peak
+3. Use the ACTUAL weather_adjusted_revenue values provided (already calculated)
+4. Use the ACTUAL estimated_wait_minutes from each peak
+5. Use the ACTUAL travel_time_from_start_minutes from each peak
+6. DO NOT invent or modify any values - use exactly what's in the data
+7. If weather shows 0% rain and sunny conditions, acknowledge this reality
+8. Revenue multipliers are ALREADY calculated in weather_adjusted_revenue
+
+YOUR MISSION:
+1. Create the most profitable route using the provided weather-adjusted revenues
+2. Use actual weather conditions (if it's sunny, say sunny; if rainy, say rainy)
+3. Account for the provided travel times
+4. Balance event + airport diversity
+5. Maximize total weather-adjusted revenue
+
+RESPOND in this exact JSON format (fill with ACTUAL values from the request data):
+{
+  "optimal_route": [
+    {
+      "sequence": <number>,
+      "peak_id": "<exact peak_id from data>",
+      "source": "<event or airport>",
+      "location": "<location_name from data>",
+      "arrival_time": "<HH:MM>",
+      "service_time_window": "<HH:MM-HH:MM>",
+      "departure_time": "<HH:MM>",
+      "base_revenue": <base_revenue from data>,
+      "weather_adjusted_revenue": <weather_adjusted_revenue from data>,
+      "weather_conditions": "<condition from weather object>, <temp_c>°C",
+      "estimated_wait_minutes": <estimated_wait_minutes from data>,
+      "travel_to_next_minutes": <calculated based on travel times>,
+      "reasoning": "<why chosen, mentioning ACTUAL weather>"
+    }
+  ],
+  "rejected_opportunities": [
+    {
+      "peak_id": "<exact peak_id>",
+      "reason": "<why rejected>",
+      "potential_revenue_lost": <number>
+    }
+  ],
+  "summary": {
+    "total_base_revenue": <sum of base revenues>,
+    "total_weather_adjusted_revenue": <sum of adjusted revenues>,
+    "weather_bonus_revenue": <difference>,
+    "total_active_time_hours": <calculated>,
+    "revenue_per_hour": <calculated>,
+    "number_of_stops": <count>,
+    "total_distance_miles": <sum>,
+    "total_wait_time_minutes": <sum>,
+    "bad_weather_stops": <count where rain > 30%>,
+    "good_weather_stops": <count where rain <= 30%>,
+    "efficiency_score": <0-1>,
+    "confidence": <0-1>
+  },
+  "weather_strategy": "Description of how ACTUAL weather (sunny/rainy) was leveraged",
+  "execution_strategy": "Step-by-step plan",
+  "risk_assessment": "Risks based on ACTUAL conditions"
+}
+"""
+
 # ============================================================================
 
+def _get_gpt_client(api_key: Optional[str]) -> OpenAI:
+    """One OpenAI client (and keep-alive connection pool) per API key, shared by all agents"""
+    with _GPT_CLIENTS_LOCK:
+        client = _GPT_CLIENTS.get(api_key)
+        if client is None:
+            http_client = httpx.Client(limits=httpx.Limits(max_connections=GPT_MAX_CONNECTIONS,
+                                                           max_keepalive_connections=GPT_MAX_CONNECTIONS))
+            client = _GPT_CLIENTS[api_key] = OpenAI(api_key=api_key, http_client=http_client)
+        return client
+
+def _extract_json(text: str) -> Optional[str]:
+    """
+    First balanced {...} object in text, found in one pass over the brace, quote and
+    backslash characters only (braces inside JSON strings are ignored). None if there is none.
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    
+    depth = 0
+    in_string = False
+    escaped_pos = -1
+    for match in _JSON_TOKEN_RE.finditer(text, start):
+        pos = match.start()
+        if pos == escaped_pos:
+            continue
+        char = match.group()
+        if in_string:
+            if char == '\\':
+                escaped_pos = pos + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos + 1]
+    return None
+
+def _rain_travel_factors(rain_chance: np.ndarray) -> np.ndarray:
+    """Bad weather slows the trip: +30% above 50% rain chance, +15% above 20%"""
+    return np.where(rain_chance > 50, 1.3, np.where(rain_chance > 20, 1.15, 1.0))
+
+def _window_offsets(time_window: str, now_minutes: int, horizon: int) -> Tuple[int, int]:
+    """
+    "HH:MM-HH:MM" as (start, end) minutes from now, capped at the planning horizon.
+    A window that is already open starts at a negative offset; unparseable windows
+    span the whole horizon.
+    """
+    try:
+        start, end = (int(t[:2]) * 60 + int(t[3:5]) for t in time_window.split('-'))
+    except (ValueError, AttributeError):
+        return 0, horizon
+    
+    window_end = (end - now_minutes) % 1440
+    return window_end - (end - start) % 1440, min(window_end, horizon)
+
 class OrchestratorConfig:
     def __init__(self, city: str):
         self.gpt_api_key = GPT_API_KEY
@@ -61,7 +267,7 @@ Your mission:
 1. Analyze all detected peaks from Event, Airport, AND Weather agents
 2. Use the ACTUAL weather data provided - don't invent conditions
 3. Create a strategic schedule that maximizes total revenue while accounting for:
-   - REAL weather conditions from the data (rain chance, temperature, wind)
+   - REAL weather conditions from the data (each peak's 'weather' and rain_chance_percent)
    - Travel time adjustments for bad weather (+20-30% in rain/snow)
    - Surge pricing opportunities during bad weather
    - Event and airport peaks
@@ -71,13 +277,13 @@ Your mission:
 
 CRITICAL RULES:
 - Use ONLY the actual weather conditions from the provided data
-- Calculate revenue multipliers based on REAL rain_chance_percent and temp_c from data
+- Use ACTUAL weather_adjusted_revenue from peaks (already includes the weather effect)
 - Use ACTUAL estimated_wait_minutes from peaks
 - Use ACTUAL travel_time_from_start_minutes from peaks
 - DO NOT invent weather conditions that don't exist in the data
 
 IMPORTANT: Respond ONLY in valid JSON format with no additional text.
-"""
+""" + PLAN_INSTRUCTIONS
 
 config = OrchestratorConfig(city=CITY)
 
@@ -85,26 +291,20 @@ class GeospatialCalculator:
     """Calculate distances and travel times"""
     
     @staticmethod
-    def haversine_distance(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        """Calculate distance in miles using Haversine formula"""
-        from math import radians, sin, cos, sqrt, atan2
-        
+    def haversine_distances(lat1: float, lng1: float, lats2, lngs2) -> np.ndarray:
+        """Haversine distances in miles from one point to many points (broadcasts like NumPy)"""
         R = 3959  # Earth's radius in miles
-        lat1, lng1, lat2, lng2 = map(radians, [lat1, lng1, lat2, lng2])
-        dlat = lat2 - lat1
-        dlng = lng2 - lng1
-        
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlng/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1-a))
+        lat1, lng1 = np.radians(lat1), np.radians(lng1)
+        lats2 = np.radians(np.asarray(lats2, dtype=np.float64))
+        lngs2 = np.radians(np.asarray(lngs2, dtype=np.float64))
         
-        return R * c
+        a = np.sin((lats2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lats2) * np.sin((lngs2 - lng1) / 2)**2
+        return 2 * R * np.arcsin(np.sqrt(a))
     
     @staticmethod
-    def calculate_travel_time(distance_miles: float, avg_speed_mph: float, buffer_minutes: int = 0, weather_factor: float = 1.0) -> int:
-        """Calculate travel time in minutes with weather adjustment"""
-        base_travel_time = (distance_miles / avg_speed_mph) * 60
-        adjusted_time = base_travel_time * weather_factor
-        return int(adjusted_time + buffer_minutes)
+    def travel_times(distances_miles: np.ndarray, avg_speed_mph: float, buffer_minutes: int, rain_chance: np.ndarray) -> np.ndarray:
+        """Whole-minute travel times, slowed by the destination's rain chance"""
+        return ((distances_miles / avg_speed_mph) * 60 * _rain_travel_factors(rain_chance) + buffer_minutes).astype(np.int64)
 
 class AgentDataCollector:
     """Collects data from Event, Airport, and Weather agents by importing them"""
@@ -116,10 +316,8 @@ class AgentDataCollector:
     def get_event_agent_data(self) -> Dict:
         """Call Event Intelligence Agent API"""
         try:
-            import requests
-            
             # Call the event agent API
-            response = requests.post(
+            response = _SESSION.post(
                 "http://localhost:1004/analyze",
                 json={"city": self.city},
                 timeout=10
@@ -136,10 +334,8 @@ class AgentDataCollector:
     def get_airport_agent_data(self) -> Dict:
         """Import and run Airport Intelligence Agent"""
         try:
-            import requests
-            
             # Call the airport agent API for all airports
-            response = requests.get(
+            response = _SESSION.get(
                 "http://localhost:1000/all_airports",
                 timeout=10
             )
@@ -155,138 +351,135 @@ class AgentDataCollector:
     def get_weather_agent_data(self) -> Dict:
         """Import and run Weather Intelligence Agent"""
         try:
-            try:
-                from weather_agent import WeatherAgent
-            except ImportError:
-                import agents.weather_agent.weather_agent as weather_agent
-                WeatherAgent = weather_agent.WeatherAgent
+            if WeatherAgent is None:
+                raise ImportError("Weather agent module is not importable")
+            
+            # Forecasts are hourly, so every orchestration within the same hour reuses one fetch
+            key = ("New York", int(time.time() // 3600))
+            with _WEATHER_CACHE_LOCK:
+                cached = _WEATHER_CACHE.get(key)
+            if cached is not None:
+                return cached
             
             weather_agent_instance = WeatherAgent(api_key=os.getenv("WEATHER_API_KEY", "7a22cd490a5046d9b48120123250410"))
             weather_data = weather_agent_instance.get_weather_analysis("New York")
             
+            with _WEATHER_CACHE_LOCK:
+                # Older hour buckets can never be hit again
+                _WEATHER_CACHE.clear()
+                _WEATHER_CACHE[key] = weather_data
             return weather_data
             
         except Exception as e:
             return {"status": "error", "agent_type": "weather_intelligence", "hourly_forecast_24h": [], "optimal_ride_hours": [], "error": str(e)}
     
     def collect_all_agent_data(self) -> Tuple[Dict, Dict, Dict]:
-        """Run all three agents and collect their recommendations"""
-        event_data = self.get_event_agent_data()
-        airport_data = self.get_airport_agent_data()
-        weather_data = self.get_weather_agent_data()
-        
-        return event_data, airport_data, weather_data
+        """Run all three agents concurrently and collect their recommendations"""
+        # Each getter is I/O bound and catches its own errors, so the total wait is the slowest agent
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            event_future = pool.submit(self.get_event_agent_data)
+            airport_future = pool.submit(self.get_airport_agent_data)
+            weather_future = pool.submit(self.get_weather_agent_data)
+            
+            return event_future.result(), airport_future.result(), weather_future.result()
 
 class OrchestratorAgent:
     """Master orchestrator using GPT AI to create optimal route plans with weather intelligence"""
     
     def __init__(self, config: OrchestratorConfig):
         self.config = config
-        self.gpt_client = OpenAI(api_key=config.gpt_api_key)
+        self.gpt_client = _get_gpt_client(config.gpt_api_key)
         self.geo_calc = GeospatialCalculator()
         self.collector = AgentDataCollector(config.city, config.max_planning_hours)
         self.agent_id = f"orchestrator_{config.city.lower().replace(' ', '_')}"
     
     def _convert_priority_to_score(self, priority: str) -> float:
         """Convert priority string to numeric score"""
-        priority_map = {
-            'high': 0.9,
-            'medium': 0.6,
-            'low': 0.3
-        }
-        return priority_map.get(priority.lower(), 0.5)
+        return PRIORITY_SCORES.get(priority.lower(), 0.5)
+    
+    def _calculate_weather_multipliers(self, rain_chance: np.ndarray, temp_c: np.ndarray) -> np.ndarray:
+        """Revenue multipliers from weather conditions: rain above 30% and cold below 10°C, capped at 2x"""
+        rain_boost = np.where(rain_chance > 30, (rain_chance / 100) * 0.5, 0.0)
+        cold_boost = np.where(temp_c < 10, (10 - temp_c) * 0.02, 0.0)
+        return np.minimum(1.0 + rain_boost + cold_boost, 2.0)
     
-    def _calculate_weather_multiplier(self, hour_data: Dict) -> float:
-        """Calculate revenue multiplier based on weather conditions"""
-        rain_chance = hour_data.get('rain_chance_percent', 0)
-        temp_c = hour_data.get('temp_c', 15)
+    def _enrich_peaks(self, details: List[Dict], coords: np.ndarray, weather_by_hour: Dict) -> List[Dict]:
+        """
+        Add distance, weather and travel-time fields to peaks from any source in one pass.
+        details[i] carries peak i's source-specific fields; coords[i] is its (lat, lng).
+        Values are kept at full precision; they are rounded where they are shown.
+        """
+        current_location = self.config.driver_start_location
+        distances = self.geo_calc.haversine_distances(
+            current_location['lat'], current_location['lng'], coords[:, 0], coords[:, 1]
+        )
         
-        multiplier = 1.0
+        weather_for_peaks = []
+        for detail in details:
+            time_window = detail['time_window']
+            peak_hour = time_window.split('-')[0] if '-' in time_window else None
+            weather_for_peaks.append(weather_by_hour.get(peak_hour) if peak_hour else None)
         
-        if rain_chance > 30:
-            multiplier += (rain_chance / 100) * 0.5
+        # (peaks without forecast data get neutral weather: no rain, 15°C)
+        rain = np.array([w.get('rain_chance_percent', 0) if w else 0 for w in weather_for_peaks], dtype=np.float64)
+        temp = np.array([w.get('temp_c', 15) if w else 15 for w in weather_for_peaks], dtype=np.float64)
+        weather_multipliers = self._calculate_weather_multipliers(rain, temp)
+        travel_times = self.geo_calc.travel_times(distances, self.config.avg_speed_mph, self.config.travel_buffer, rain)
         
-        if temp_c < 10:
-            multiplier += (10 - temp_c) * 0.02
+        enriched = []
+        rows = zip(details, weather_for_peaks, distances.tolist(), travel_times.tolist(), weather_multipliers.tolist())
+        for detail, weather_for_peak, distance, travel_time, weather_multiplier in rows:
+            adjusted_revenue = detail['base_revenue'] * weather_multiplier
+            
+            enriched.append({
+                'peak_id': detail['peak_id'],
+                'source': detail['source'],
+                'time_window': detail['time_window'],
+                'description': detail['description'],
+                'location_name': detail['location_name'],
+                'location': detail['location'],
+                'base_revenue': detail['base_revenue'],
+                'estimated_revenue': adjusted_revenue,
+                'weather_multiplier': weather_multiplier,
+                detail['count_field']: detail['count'],
+                'estimated_wait_minutes': detail['estimated_wait_minutes'],
+                'priority': detail['priority'],
+                'priority_score': self._convert_priority_to_score(detail['priority']),
+                'distance_from_start_miles': distance,
+                'travel_time_from_start_minutes': travel_time,
+                'weather_conditions': weather_for_peak if weather_for_peak else None
+            })
         
-        return min(multiplier, 2.0)
+        return enriched
     
     def prepare_peaks_for_ai(self, event_data: Dict, airport_data: Dict, weather_data: Dict) -> List[Dict]:
         """Extract and enrich all peaks with travel calculations and weather data"""
         
-        all_peaks = []
-        current_location = self.config.driver_start_location
-        
-        weather_hourly = {h['datetime']: h for h in weather_data.get('hourly_forecast_24h', [])}
+        # Forecast hours keyed by their "HH:MM" part ("YYYY-MM-DD HH:MM"); the earliest hour wins
+        weather_by_hour = {h['datetime'][-5:]: h for h in reversed(weather_data.get('hourly_forecast_24h', []))}
         
         event_peaks = event_data.get('all_peaks', [])
-        for peak in event_peaks:
-            venue_locations = {
-                "Madison Square Garden": {"lat": 40.7505, "lng": -73.9934},
-                "Barclays Center": {"lat": 40.6826, "lng": -73.9754},
-                "Yankee Stadium": {"lat": 40.8296, "lng": -73.9262},
-                "Radio City Music Hall": {"lat": 40.7599, "lng": -73.9799},
-                "Brooklyn Steel": {"lat": 40.7183, "lng": -73.9571},
-                "Terminal 5": {"lat": 40.7677, "lng": -73.9887},
-                "Webster Hall": {"lat": 40.7298, "lng": -73.9891}
-            }
-            
+        event_coords = _VENUE_COORDS[
+            [_VENUE_INDEX.get(peak.get('venue_name', 'Unknown Venue'), _DEFAULT_VENUE_INDEX) for peak in event_peaks]
+        ]
+        details = []
+        for peak, (lat, lng) in zip(event_peaks, event_coords.tolist()):
             venue_name = peak.get('venue_name', 'Unknown Venue')
-            location = venue_locations.get(venue_name, {"lat": 40.7580, "lng": -73.9855})
-            
-            distance = self.geo_calc.haversine_distance(
-                current_location['lat'], current_location['lng'],
-                location['lat'], location['lng']
-            )
-            
-            time_window = peak.get('time_window', '')
-            peak_hour = time_window.split('-')[0] if '-' in time_window else None
-            weather_for_peak = None
-            weather_multiplier = 1.0
-            
-            if peak_hour:
-                for weather_time, weather_info in weather_hourly.items():
-                    if peak_hour in weather_time:
-                        weather_for_peak = weather_info
-                        weather_multiplier = self._calculate_weather_multiplier(weather_info)
-                        break
-            
-            weather_factor = 1.0
-            if weather_for_peak:
-                rain_chance = weather_for_peak.get('rain_chance_percent', 0)
-                if rain_chance > 50:
-                    weather_factor = 1.3
-                elif rain_chance > 20:
-                    weather_factor = 1.15
-            
-            travel_time = self.geo_calc.calculate_travel_time(
-                distance, self.config.avg_speed_mph, self.config.travel_buffer, weather_factor
-            )
-            
-            estimated_revenue = peak.get('estimated_revenue', 
-                                peak.get('expected_revenue',
-                                event_data.get('avg_event_fare', 25)))
-            
-            adjusted_revenue = estimated_revenue * weather_multiplier
-            
-            all_peaks.append({
+            details.append({
                 'peak_id': peak.get('peak_id', 'event_unknown'),
                 'source': 'event',
                 'time_window': peak.get('time_window', 'N/A'),
                 'description': f"{peak.get('event_name', 'Event')} at {venue_name}",
                 'location_name': venue_name,
-                'location': location,
-                'base_revenue': estimated_revenue,
-                'estimated_revenue': round(adjusted_revenue, 2),
-                'weather_multiplier': round(weather_multiplier, 2),
-                'estimated_attendees': peak.get('estimated_attendees', 0),
-                'estimated_wait_minutes': peak.get('estimated_wait_minutes', 
+                'location': {"lat": lat, "lng": lng},
+                'base_revenue': peak.get('estimated_revenue',
+                                         peak.get('expected_revenue',
+                                         event_data.get('avg_event_fare', 25))),
+                'count_field': 'estimated_attendees',
+                'count': peak.get('estimated_attendees', 0),
+                'estimated_wait_minutes': peak.get('estimated_wait_minutes',
                                                    peak.get('waiting_time_minutes', 15)),
-                'priority': peak.get('priority', 'medium'),
-                'priority_score': self._convert_priority_to_score(peak.get('priority', 'medium')),
-                'distance_from_start_miles': round(distance, 2),
-                'travel_time_from_start_minutes': travel_time,
-                'weather_conditions': weather_for_peak if weather_for_peak else None
+                'priority': peak.get('priority', 'medium')
             })
         
         # Extract peaks from airport data - handle both formats
@@ -313,73 +506,201 @@ class OrchestratorAgent:
                             'priority': 'medium'
                         })
         
-        for peak in airport_peaks:
-            airport_locations = {
-                'JFK': {'lat': 40.6413, 'lng': -73.7781, 'name': 'JFK Airport'},
-                'LGA': {'lat': 40.7769, 'lng': -73.8740, 'name': 'LaGuardia Airport'},
-                'EWR': {'lat': 40.6895, 'lng': -74.1745, 'name': 'Newark Airport'}
-            }
-            
-            airport_code = peak.get('airport_code', 'JFK')
-            location_data = airport_locations.get(airport_code, airport_locations['JFK'])
-            
-            distance = self.geo_calc.haversine_distance(
-                current_location['lat'], current_location['lng'],
-                location_data['lat'], location_data['lng']
-            )
-            
-            time_window = peak.get('time_window', '')
-            peak_hour = time_window.split('-')[0] if '-' in time_window else None
-            weather_for_peak = None
-            weather_multiplier = 1.0
-            
-            if peak_hour:
-                for weather_time, weather_info in weather_hourly.items():
-                    if peak_hour in weather_time:
-                        weather_for_peak = weather_info
-                        weather_multiplier = self._calculate_weather_multiplier(weather_info)
-                        break
-            
-            weather_factor = 1.0
-            if weather_for_peak:
-                rain_chance = weather_for_peak.get('rain_chance_percent', 0)
-                if rain_chance > 50:
-                    weather_factor = 1.3
-                elif rain_chance > 20:
-                    weather_factor = 1.15
-            
-            travel_time = self.geo_calc.calculate_travel_time(
-                distance, self.config.avg_speed_mph, self.config.travel_buffer, weather_factor
-            )
-            
-            base_revenue = peak.get('estimated_revenue', 50)
-            adjusted_revenue = base_revenue * weather_multiplier
-            
-            all_peaks.append({
+        airport_idx = [_AIRPORT_INDEX.get(peak.get('airport_code', 'JFK'), _AIRPORT_INDEX['JFK']) for peak in airport_peaks]
+        airport_coords = _AIRPORT_COORDS[airport_idx]
+        for peak, idx, (lat, lng) in zip(airport_peaks, airport_idx, airport_coords.tolist()):
+            airport_name = peak.get('airport_name', AIRPORT_NAMES[_AIRPORT_CODES[idx]])
+            details.append({
                 'peak_id': peak.get('peak_id', 'airport_unknown'),
                 'source': 'airport',
                 'time_window': peak.get('time_window', 'N/A'),
-                'description': f"{peak.get('num_flights', 0)} flights at {peak.get('airport_name', location_data['name'])}",
-                'location_name': peak.get('airport_name', location_data['name']),
-                'location': {'lat': location_data['lat'], 'lng': location_data['lng']},
-                'base_revenue': base_revenue,
-                'estimated_revenue': round(adjusted_revenue, 2),
-                'weather_multiplier': round(weather_multiplier, 2),
-                'num_flights': peak.get('num_flights', 0),
+                'description': f"{peak.get('num_flights', 0)} flights at {airport_name}",
+                'location_name': airport_name,
+                'location': {'lat': lat, 'lng': lng},
+                'base_revenue': peak.get('estimated_revenue', 50),
+                'count_field': 'num_flights',
+                'count': peak.get('num_flights', 0),
                 'estimated_wait_minutes': peak.get('estimated_wait_minutes', 20),
-                'priority': peak.get('priority', 'medium'),
-                'priority_score': self._convert_priority_to_score(peak.get('priority', 'medium')),
-                'distance_from_start_miles': round(distance, 2),
-                'travel_time_from_start_minutes': travel_time,
-                'weather_conditions': weather_for_peak if weather_for_peak else None
+                'priority': peak.get('priority', 'medium')
+            })
+        
+        return self._enrich_peaks(details, np.concatenate([event_coords, airport_coords]), weather_by_hour)
+    
+    def stream_plan_text(self, user_prompt: str) -> Iterator[str]:
+        """Yield the model's plan text chunk by chunk as it is generated"""
+        stream = self.gpt_client.chat.completions.create(
+            model=self.config.gpt_model,
+            messages=[
+                {"role": "system", "content": self.config.system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            temperature=self.config.temperature,
+            max_tokens=self.config.max_tokens,
+            stream=True
+        )
+        
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def _annotate_plan(self, plan: Dict, viable_peaks: List[Dict], weather_summary: Dict, timestamp: str) -> Dict:
+        """Stamp the agent metadata shared by AI and fast-path plans"""
+        plan['agent_id'] = self.agent_id
+        plan['agent_type'] = 'orchestrator_with_weather'
+        plan['city'] = self.config.city
+        plan['timestamp'] = timestamp
+        plan['total_peaks_analyzed'] = len(viable_peaks)
+        source_counts = Counter(p['source'] for p in viable_peaks)
+        plan['event_peaks_count'] = source_counts['event']
+        plan['airport_peaks_count'] = source_counts['airport']
+        plan['weather_data_included'] = True
+        plan['weather_summary'] = weather_summary
+        return plan
+    
+    def _plan_route_fast(self, viable_peaks: List[Dict], now: datetime) -> Dict:
+        """
+        Plan the route without the model (few peaks): an exact bitmask DP over
+        (visited peaks, last peak) that keeps the non-dominated (departure time, score)
+        labels per state. Score is weather-adjusted revenue minus travel and waiting costs.
+        Returns the same JSON shape the model is asked for.
+        """
+        n = len(viable_peaks)
+        now_minutes = now.hour * 60 + now.minute
+        horizon = self.config.max_planning_hours * 60
+        windows = [_window_offsets(p['time_window'], now_minutes, horizon) for p in viable_peaks]
+        revenues = [p['estimated_revenue'] for p in viable_peaks]
+        waits = [p['estimated_wait_minutes'] for p in viable_peaks]
+        start_travel = [p['travel_time_from_start_minutes'] for p in viable_peaks]
+        
+        # Peak-to-peak legs, slowed by the destination's rain like the legs from the start
+        lats = np.array([p['location']['lat'] for p in viable_peaks], dtype=np.float64)
+        lngs = np.array([p['location']['lng'] for p in viable_peaks], dtype=np.float64)
+        distances = self.geo_calc.haversine_distances(lats[:, None], lngs[:, None], lats, lngs)
+        rain = np.array([(p['weather_conditions'] or {}).get('rain_chance_percent', 0) for p in viable_peaks], dtype=np.float64)
+        travel = self.geo_calc.travel_times(distances, self.config.avg_speed_mph, self.config.travel_buffer, rain).tolist()
+        distances = distances.tolist()
+        
+        labels: Dict[Tuple[int, int], List[Tuple[float, float, Tuple[int, ...]]]] = {}
+        
+        def visit(mask: int, last: Optional[int], depart: float, score: float, path: Tuple[int, ...], j: int):
+            leg = start_travel[j] if last is None else travel[last][j]
+            arrive = depart + leg
+            window_start, window_end = windows[j]
+            service = max(arrive, window_start)
+            if service > window_end:
+                return
+            new_score = (score + revenues[j] - PLANNER_TRAVEL_COST_PER_MINUTE * leg
+                         - PLANNER_WAIT_COST_PER_MINUTE * (service - arrive + waits[j]))
+            labels.setdefault((mask | 1 << j, j), []).append((service + waits[j], new_score, path + (j,)))
+        
+        for j in range(n):
+            visit(0, None, 0, 0.0, (), j)
+        
+        best_score, best_path = 0.0, ()
+        # Transitions only ever add a bit, so increasing mask order sees every state after its predecessors
+        for mask in range(1, 1 << n):
+            for last in range(n):
+                front = labels.pop((mask, last), None)
+                if not front:
+                    continue
+                front.sort(key=lambda label: (label[0], -label[1]))
+                # A label departing d minutes earlier is only guaranteed to do as well
+                # downstream if its lead covers the d extra minutes it may idle at a window,
+                # so labels are compared on score + wait cost * departure
+                front_best = float('-inf')
+                for depart, score, path in front:
+                    reach = score + PLANNER_WAIT_COST_PER_MINUTE * depart
+                    if reach <= front_best:
+                        continue  # dominated by an earlier label whose lead covers the idle time
+                    front_best = reach
+                    if score > best_score:
+                        best_score, best_path = score, path
+                    for j in range(n):
+                        if not mask >> j & 1:
+                            visit(mask, last, depart, score, path, j)
+        
+        def clock(minutes: float) -> str:
+            return (now + timedelta(minutes=minutes)).strftime('%H:%M')
+        
+        route = []
+        elapsed = 0
+        total_distance = 0.0
+        prev = None
+        for j in best_path:
+            peak = viable_peaks[j]
+            leg = start_travel[j] if prev is None else travel[prev][j]
+            total_distance += peak['distance_from_start_miles'] if prev is None else distances[prev][j]
+            if route:
+                route[-1]['travel_to_next_minutes'] = leg
+            
+            arrive = elapsed + leg
+            service = max(arrive, windows[j][0])
+            elapsed = service + waits[j]
+            weather = peak['weather_conditions']
+            route.append({
+                "sequence": len(route) + 1,
+                "peak_id": peak['peak_id'],
+                "source": peak['source'],
+                "location": peak['location_name'],
+                "arrival_time": clock(arrive),
+                "service_time_window": f"{clock(service)}-{clock(elapsed)}",
+                "departure_time": clock(elapsed),
+                "base_revenue": peak['base_revenue'],
+                "weather_adjusted_revenue": round(peak['estimated_revenue'], 2),
+                "weather_multiplier": round(peak['weather_multiplier'], 2),
+                "weather_conditions": f"{weather.get('condition')}, {weather.get('temp_c')}°C" if weather else "No forecast data",
+                "estimated_wait_minutes": waits[j],
+                "travel_to_next_minutes": 0,
+                "reasoning": f"{peak['description']}: {peak['estimated_revenue']:.2f} expected for {leg} min travel and {waits[j]} min wait"
             })
+            prev = j
         
-        return all_peaks
+        chosen = set(best_path)
+        rejected = [
+            {
+                "peak_id": peak['peak_id'],
+                "reason": ("Cannot be reached within its time window and the planning horizon"
+                           if max(start_travel[j], windows[j][0]) > windows[j][1]
+                           else "Lower net value than the chosen stops, or clashes with their timing"),
+                "potential_revenue_lost": round(peak['estimated_revenue'], 2)
+            }
+            for j, peak in enumerate(viable_peaks) if j not in chosen
+        ]
+        
+        stops = [viable_peaks[j] for j in best_path]
+        total_base = sum(p['base_revenue'] for p in stops)
+        total_adjusted = sum(p['estimated_revenue'] for p in stops)
+        active_hours = elapsed / 60
+        bad_weather_stops = sum(1 for p in stops if (p['weather_conditions'] or {}).get('rain_chance_percent', 0) > 30)
+        
+        return {
+            "optimal_route": route,
+            "rejected_opportunities": rejected,
+            "summary": {
+                "total_base_revenue": round(total_base, 2),
+                "total_weather_adjusted_revenue": round(total_adjusted, 2),
+                "weather_bonus_revenue": round(total_adjusted - total_base, 2),
+                "total_active_time_hours": round(active_hours, 2),
+                "revenue_per_hour": round(total_adjusted / active_hours, 2) if active_hours else 0.0,
+                "number_of_stops": len(route),
+                "total_distance_miles": round(total_distance, 2),
+                "total_wait_time_minutes": sum(waits[j] for j in best_path),
+                "bad_weather_stops": bad_weather_stops,
+                "good_weather_stops": len(stops) - bad_weather_stops,
+                "efficiency_score": round(total_adjusted / sum(revenues), 2) if sum(revenues) else 0.0,
+                "confidence": 1.0  # exact for the given estimates
+            },
+            "weather_strategy": (f"{bad_weather_stops} stop(s) fall in forecast rain above 30%; their revenue includes the weather multiplier"
+                                 if bad_weather_stops else "No stop has forecast rain above 30%; revenues reflect the actual conditions"),
+            "execution_strategy": " -> ".join(f"{stop['arrival_time']} {stop['location']}" for stop in route) or "No profitable stop fits the schedule",
+            "risk_assessment": "Planned deterministically from the agents' estimates; real waits and traffic may differ"
+        }
     
     def create_optimal_plan_with_ai(self, event_data: Dict, airport_data: Dict, weather_data: Dict) -> Dict:
         """Use GPT AI to analyze all peaks with weather intelligence and create optimal route plan"""
         
         now = datetime.now()
+        timestamp = now.isoformat()
         all_peaks = self.prepare_peaks_for_ai(event_data, airport_data, weather_data)
         
         if not all_peaks:
@@ -387,7 +708,7 @@ class OrchestratorAgent:
                 "status": "no_opportunities",
                 "message": "No viable peaks detected",
                 "agent_id": self.agent_id,
-                "timestamp": now.isoformat()
+                "timestamp": timestamp
             }
         
         viable_peaks = [p for p in all_peaks if p['estimated_revenue'] >= self.config.min_revenue_threshold]
@@ -397,49 +718,51 @@ class OrchestratorAgent:
                 "status": "low_revenue",
                 "message": f"No peaks exceed €{self.config.min_revenue_threshold} threshold",
                 "agent_id": self.agent_id,
-                "timestamp": now.isoformat(),
+                "timestamp": timestamp,
                 "all_peaks_found": len(all_peaks)
             }
         
         weather_summary = weather_data.get('summary', {})
+        
+        # Small problems are solved exactly without the model round-trip
+        if len(viable_peaks) <= FAST_PATH_MAX_PEAKS:
+            plan = self._annotate_plan(self._plan_route_fast(viable_peaks, now), viable_peaks, weather_summary, timestamp)
+            plan['planner'] = 'deterministic'
+            return plan
+        
         optimal_weather_hours = weather_data.get('optimal_ride_hours', [])[:5]
         
+        # Only the fields the model needs to build the plan (weather_multiplier is filled back in afterwards)
         peaks_with_weather = []
         for peak in viable_peaks:
             peak_data = {
                 'peak_id': peak['peak_id'],
                 'source': peak['source'],
                 'time_window': peak['time_window'],
-                'description': peak['description'],
                 'location_name': peak['location_name'],
                 'base_revenue': peak['base_revenue'],
-                'weather_adjusted_revenue': peak['estimated_revenue'],
-                'weather_multiplier': peak['weather_multiplier'],
+                'weather_adjusted_revenue': round(peak['estimated_revenue'], 2),
                 'estimated_wait_minutes': peak['estimated_wait_minutes'],
                 'priority': peak['priority'],
-                'distance_from_start_miles': peak['distance_from_start_miles'],
+                'distance_from_start_miles': round(peak['distance_from_start_miles'], 1),
                 'travel_time_from_start_minutes': peak['travel_time_from_start_minutes']
             }
             
-            
-            if peak.get('weather_conditions'):
-                weather = peak['weather_conditions']
-                peak_data['weather'] = {
-                    'temp_c': weather.get('temp_c'),
-                    'condition': weather.get('condition'),
-                    'rain_chance_percent': weather.get('rain_chance_percent'),
-                    'wind_kph': weather.get('wind_kph')
-                }
+            weather = peak['weather_conditions']
+            if weather:
+                peak_data['weather'] = f"{weather.get('condition')}, {weather.get('temp_c')}°C"
+                peak_data['rain_chance_percent'] = weather.get('rain_chance_percent')
             
             peaks_with_weather.append(peak_data)
         
-        user_prompt = f"""ORCHESTRATION ANALYSIS WITH WEATHER INTELLIGENCE - {self.config.city}
+        config = self.config
+        user_prompt = f"""ORCHESTRATION ANALYSIS WITH WEATHER INTELLIGENCE - {config.city}
 
 CURRENT STATUS:
-- Current time: {now.strftime('%H:%M')}
-- Current location: {self.config.driver_start_location['name']}
-- Planning horizon: {self.config.max_planning_hours} hours
-- Average speed: {self.config.avg_speed_mph} mph (adjusted for weather)
+- Current time: {timestamp[11:16]}
+- Current location: {config.driver_start_location['name']}
+- Planning horizon: {config.max_planning_hours} hours
+- Average speed: {config.avg_speed_mph} mph (adjusted for weather)
 
 WEATHER FORECAST SUMMARY:
 - Average temperature: {weather_summary.get('avg_temp_c', 'N/A')}°C
@@ -447,128 +770,50 @@ WEATHER FORECAST SUMMARY:
 - Best weather hour for rides: {weather_summary.get('best_hour_recommendation', 'N/A')}
 
 TOP 5 WEATHER OPPORTUNITIES (highest demand hours):
-{json.dumps(optimal_weather_hours, indent=2)}
+{orjson.dumps(optimal_weather_hours, option=orjson.OPT_INDENT_2).decode()}
 
 DETECTED OPPORTUNITIES WITH WEATHER ADJUSTMENTS ({len(viable_peaks)} viable peaks):
-{json.dumps(peaks_with_weather, indent=2)}
-
-CRITICAL INSTRUCTIONS:
-1. Use ONLY the actual weather data provided above
-2. For weather_conditions field, extract from the 'weather' object in each peak
-3. Use the ACTUAL weather_adjusted_revenue values provided (already calculated)
-4. Use the ACTUAL estimated_wait_minutes from each peak
-5. Use the ACTUAL travel_time_from_start_minutes from each peak
-6. DO NOT invent or modify any values - use exactly what's in the data
-7. If weather shows 0% rain and sunny conditions, acknowledge this reality
-8. Revenue multipliers are ALREADY calculated in weather_adjusted_revenue
-
-YOUR MISSION:
-1. Create the most profitable route using the provided weather-adjusted revenues
-2. Use actual weather conditions (if it's sunny, say sunny; if rainy, say rainy)
-3. Account for the provided travel times
-4. Balance event + airport diversity
-5. Maximize total weather-adjusted revenue
-
-RESPOND in this exact JSON format (fill with ACTUAL values from data above):
-{{
-  "optimal_route": [
-    {{
-      "sequence": <number>,
-      "peak_id": "<exact peak_id from data>",
-      "source": "<event or airport>",
-      "location": "<location_name from data>",
-      "arrival_time": "<HH:MM>",
-      "service_time_window": "<HH:MM-HH:MM>",
-      "departure_time": "<HH:MM>",
-      "base_revenue": <base_revenue from data>,
-      "weather_adjusted_revenue": <weather_adjusted_revenue from data>,
-      "weather_multiplier": <weather_multiplier from data>,
-      "weather_conditions": "<condition from weather object>, <temp_c>°C",
-      "estimated_wait_minutes": <estimated_wait_minutes from data>,
-      "travel_to_next_minutes": <calculated based on travel times>,
-      "reasoning": "<why chosen, mentioning ACTUAL weather>"
-    }}
-  ],
-  "rejected_opportunities": [
-    {{
-      "peak_id": "<exact peak_id>",
-      "reason": "<why rejected>",
-      "potential_revenue_lost": <number>
-    }}
-  ],
-  "summary": {{
-    "total_base_revenue": <sum of base revenues>,
-    "total_weather_adjusted_revenue": <sum of adjusted revenues>,
-    "weather_bonus_revenue": <difference>,
-    "total_active_time_hours": <calculated>,
-    "revenue_per_hour": <calculated>,
-    "number_of_stops": <count>,
-    "total_distance_miles": <sum>,
-    "total_wait_time_minutes": <sum>,
-    "bad_weather_stops": <count where rain > 30%>,
-    "good_weather_stops": <count where rain <= 30%>,
-    "efficiency_score": <0-1>,
-    "confidence": <0-1>
-  }},
-  "weather_strategy": "Description of how ACTUAL weather (sunny/rainy) was leveraged",
-  "execution_strategy": "Step-by-step plan",
-  "risk_assessment": "Risks based on ACTUAL conditions"
-}}"""
+{orjson.dumps(peaks_with_weather).decode()}"""
 
         try:
-            chat_completion = self.gpt_client.chat.completions.create(
-                model=self.config.gpt_model,
-                messages=[
-                    {"role": "system", "content": self.config.system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
-            )
-            
-            ai_response = chat_completion.choices[0].message.content
+            ai_response = "".join(self.stream_plan_text(user_prompt))
             
-            import re
             cleaned = ai_response.strip()
             
             if cleaned.startswith('```'):
-                lines = cleaned.split('\n')
-                cleaned = '\n'.join([l for l in lines if not l.strip().startswith('```')])
-            
-            cleaned = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', cleaned)
-            
-            json_start = cleaned.find('{')
-            json_end = cleaned.rfind('}') + 1
+                cleaned = _FENCE_LINE_RE.sub('', cleaned)
+            
+            cleaned = _CONTROL_CHARS_RE.sub('', cleaned)
+            
+            json_str = _extract_json(cleaned)
+            if json_str is None:
+                # Typically a reply cut off by max_tokens: keep the preview to diagnose it
+                return {
+                    "status": "parse_error",
+                    "error": "Failed to parse AI response: no complete JSON object found",
+                    "agent_id": self.agent_id,
+                    "timestamp": timestamp,
+                    "raw_response_preview": ai_response[:500]
+                }
+            ai_analysis = orjson.loads(json_str)
             
-            if json_start >= 0 and json_end > json_start:
-                json_str = cleaned[json_start:json_end]
-                try:
-                    ai_analysis = json.loads(json_str)
-                except json.JSONDecodeError:
-                    json_str = json_str.replace('\n', ' ').replace('\r', '')
-                    ai_analysis = json.loads(json_str)
-            else:
-                raise ValueError("No valid JSON in response")
+            peaks_by_id = {p['peak_id']: p for p in viable_peaks}
+            for stop in ai_analysis.get('optimal_route') or []:
+                peak = peaks_by_id.get(stop.get('peak_id')) if isinstance(stop, dict) else None
+                if peak:
+                    stop['weather_multiplier'] = round(peak['weather_multiplier'], 2)
             
-            ai_analysis['agent_id'] = self.agent_id
-            ai_analysis['agent_type'] = 'orchestrator_with_weather'
-            ai_analysis['city'] = self.config.city
-            ai_analysis['timestamp'] = now.isoformat()
-            ai_analysis['total_peaks_analyzed'] = len(viable_peaks)
-            ai_analysis['event_peaks_count'] = len([p for p in viable_peaks if p['source'] == 'event'])
-            ai_analysis['airport_peaks_count'] = len([p for p in viable_peaks if p['source'] == 'airport'])
-            ai_analysis['weather_data_included'] = True
-            ai_analysis['weather_summary'] = weather_summary
+            self._annotate_plan(ai_analysis, viable_peaks, weather_summary, timestamp)
             ai_analysis['gpt_model'] = self.config.gpt_model
             
             return ai_analysis
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             return {
                 "status": "parse_error",
                 "error": f"Failed to parse AI response: {str(e)}",
                 "agent_id": self.agent_id,
-                "timestamp": now.isoformat(),
+                "timestamp": timestamp,
                 "raw_response_preview": ai_response[:500]
             }
         except Exception as e:
@@ -576,7 +821,7 @@ RESPOND in this exact JSON format (fill with ACTUAL values from data above):
                 "status": "error",
                 "error": str(e),
                 "agent_id": self.agent_id,
-                "timestamp": now.isoformat()
+                "timestamp": timestamp
             }
     
     def _calculate_break_requirements(self, wellbeing_score: float) -> Dict:
@@ -0,0 +1,89 @@
+import itertools
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import orchestrator as o
+
+
+NOW = datetime(2025, 10, 5, 13, 7)
+
+
+@pytest.fixture(scope="module")
+def agent():
+    config = o.OrchestratorConfig(city="New York")
+    config.gpt_api_key = "test-key"
+    return o.OrchestratorAgent(config)
+
+
+def _random_peaks(rng: random.Random, n: int):
+    peaks = []
+    for i in range(n):
+        hour, minute = rng.randint(12, 26) % 24, rng.choice([0, 30])
+        end_hour, end_minute = (hour + (minute + 30) // 60) % 24, (minute + 30) % 60
+        time_window = f"{hour:02d}:{minute:02d}-{end_hour:02d}:{end_minute:02d}" if rng.random() > 0.1 else "N/A"
+        weather = None if rng.random() < 0.4 else {
+            "rain_chance_percent": rng.choice([0, 25, 60]), "temp_c": 5, "condition": "Rain"
+        }
+        peaks.append({
+            "peak_id": f"p{i}",
+            "source": rng.choice(["event", "airport"]),
+            "time_window": time_window,
+            "description": f"Peak {i}",
+            "location_name": f"Location {i}",
+            "location": {"lat": 40.6 + rng.random() * 0.3, "lng": -74.2 + rng.random() * 0.5},
+            "base_revenue": 40,
+            "estimated_revenue": rng.randint(20, 120),
+            "weather_multiplier": 1.0,
+            "estimated_wait_minutes": rng.choice([10, 15, 20, 45]),
+            "priority": "high",
+            "distance_from_start_miles": 3.0,
+            "travel_time_from_start_minutes": rng.randint(10, 60),
+            "weather_conditions": weather,
+        })
+    return peaks
+
+
+def _route_score(agent, peaks, order):
+    """Score of visiting peaks in this order under the fast planner's rules, None if infeasible"""
+    now_minutes = NOW.hour * 60 + NOW.minute
+    horizon = agent.config.max_planning_hours * 60
+    lats = np.array([p["location"]["lat"] for p in peaks])
+    lngs = np.array([p["location"]["lng"] for p in peaks])
+    distances = agent.geo_calc.haversine_distances(lats[:, None], lngs[:, None], lats, lngs)
+    rain = np.array([(p["weather_conditions"] or {}).get("rain_chance_percent", 0) for p in peaks], dtype=np.float64)
+    travel = agent.geo_calc.travel_times(distances, agent.config.avg_speed_mph, agent.config.travel_buffer, rain).tolist()
+
+    elapsed, score, prev = 0, 0.0, None
+    for j in order:
+        peak = peaks[j]
+        window_start, window_end = o._window_offsets(peak["time_window"], now_minutes, horizon)
+        leg = peak["travel_time_from_start_minutes"] if prev is None else travel[prev][j]
+        arrive = elapsed + leg
+        service = max(arrive, window_start)
+        if service > window_end:
+            return None
+        score += (peak["estimated_revenue"] - o.PLANNER_TRAVEL_COST_PER_MINUTE * leg
+                  - o.PLANNER_WAIT_COST_PER_MINUTE * (service - arrive + peak["estimated_wait_minutes"]))
+        elapsed, prev = service + peak["estimated_wait_minutes"], j
+    return score
+
+
+@pytest.mark.parametrize("seed", range(400))
+def test_fast_planner_matches_brute_force(agent, seed):
+    rng = random.Random(seed)
+    peaks = _random_peaks(rng, rng.randint(2, 6))
+
+    best = 0.0
+    for k in range(1, len(peaks) + 1):
+        for order in itertools.permutations(range(len(peaks)), k):
+            score = _route_score(agent, peaks, order)
+            if score is not None:
+                best = max(best, score)
+
+    plan = agent._plan_route_fast(peaks, NOW)
+    index = {p["peak_id"]: j for j, p in enumerate(peaks)}
+    planned = _route_score(agent, peaks, [index[stop["peak_id"]] for stop in plan["optimal_route"]])
+    assert planned == pytest.approx(best)
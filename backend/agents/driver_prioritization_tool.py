@@ -20,12 +20,125 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields
+import os
+import sys
+import tempfile
 import warnings
-warnings.filterwarnings('ignore')
 
+# Order of the columns of the weighted-contribution matrix (same keys as agent.weights)
+FACTOR_NAMES = ('rating', 'acceptance', 'cancellation', 'activeness', 'safety', 'experience_boost')
 
-@dataclass
+# Seed for the synthetic metrics generated when the metrics CSV is missing
+MOCK_DATA_SEED = 42
+
+# Column dtypes the scoring path relies on, enforced once after loading
+SCORING_DTYPES = {
+    'rating': np.float64,
+    'completed_trips': np.int64,
+    'acceptance_rate': np.float64,
+    'cancellation_rate': np.float64,
+    'activeness_score': np.float64,
+    'safety_score': np.float64,
+}
+
+
+def _parse_excel_sheet(path: str, sheet_name) -> pd.DataFrame:
+    """pd.read_excel with openpyxl's workbook-styling UserWarnings silenced for this call only"""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=UserWarning)
+        return pd.read_excel(path, sheet_name=sheet_name)
+
+
+def _read_excel_sheet(path: str, sheet_name) -> pd.DataFrame:
+    """
+    Read one sheet of an Excel workbook through a Parquet sidecar cache.
+    
+    openpyxl parsing is slow, so the sheet is written once to
+    '<path>.<sheet>.parquet' and re-read from there until the workbook changes.
+    """
+    cache = f"{path}.{sheet_name}.parquet"
+    try:
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+            return pd.read_parquet(cache)
+    except (ImportError, ValueError, OSError):
+        pass  # No Parquet engine, or a corrupt sidecar: re-parse the workbook
+    
+    df = _parse_excel_sheet(path, sheet_name)
+    tmp = None
+    try:
+        # Write beside the target and swap it in, so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache) or '.', suffix='.tmp')
+        os.close(fd)
+        df.to_parquet(tmp, compression='snappy')
+        os.replace(tmp, cache)
+    except (ImportError, ValueError, OSError):
+        pass  # Cache is optional (no Parquet engine, unserializable column or read-only data dir)
+    finally:
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+    return df
+
+
+def _score_kernel(r: np.ndarray, n: np.ndarray, accept: np.ndarray, cancel: np.ndarray,
+                  active: np.ndarray, safety: np.ndarray,
+                  m: float, a: float, n95: float, weights: np.ndarray
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Scoring core for a whole fleet: returns (EAR, experience boost, priority
+    score, contributions), where contributions is the (N, 6) matrix of
+    weighted terms summed into the priority score. weights and the
+    contribution columns are in FACTOR_NAMES order.
+    
+    Same formulas as the calculate_* methods: the normalized factors are
+    written in place into one (N, 6) matrix and the weighted sum is a single
+    matrix-vector product.
+    """
+    n = n.astype(float)
+    
+    # EAR = (m * a + n * r) / (m + n)
+    ear = np.multiply(n, r)
+    ear += m * a
+    ear /= m + n
+    
+    # E(n) = min(log(1+n) / log(1+N95), 1), 0 for n <= 0
+    exp_boost = np.zeros_like(n)
+    played = n > 0
+    np.log1p(n, out=exp_boost, where=played)
+    exp_boost *= 1.0 / np.log1p(n95)
+    np.minimum(exp_boost, 1.0, out=exp_boost)
+    
+    # Factors, EAR normalized from 1-5 stars to 0-1, C = 1 - cancel_rate
+    # (column-major so each factor column is contiguous)
+    factors = np.empty((len(n), len(FACTOR_NAMES)), order='F')
+    rating_term = factors[:, 0]
+    np.subtract(ear, 1, out=rating_term)
+    rating_term /= 4
+    factors[:, 1] = accept
+    np.subtract(1, cancel, out=factors[:, 2])
+    factors[:, 3] = active
+    factors[:, 4] = safety
+    factors[:, 5] = exp_boost
+    
+    overall = factors @ weights
+    factors *= weights  # in place: factors -> weighted contributions
+    return ear, exp_boost, overall, factors
+
+
+def _top_k_order(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, using np.partition instead of
+    a full sort. Ties are broken by input order, exactly like a stable argsort.
+    """
+    neg = -scores
+    cutoff = np.partition(neg, k - 1)[k - 1]
+    above = np.flatnonzero(neg < cutoff)
+    at_cutoff = np.flatnonzero(neg == cutoff)[:k - len(above)]
+    top = np.sort(np.concatenate([above, at_cutoff]))
+    return top[np.argsort(neg[top], kind='stable')]
+
+
+@dataclass(slots=True)
 class DriverPriorityScore:
     """Complete priority scoring for a driver"""
     earner_id: str
@@ -46,6 +159,68 @@ class DriverPriorityScore:
     rank: int
 
 
+@dataclass
+class PriorityScoresSoA:
+    """
+    Ranked priority scores stored column-wise: one NumPy array per
+    DriverPriorityScore field, all sorted best driver first.
+    """
+    earner_id: np.ndarray
+    raw_rating: np.ndarray
+    experience_adjusted_rating: np.ndarray
+    experience_boost: np.ndarray
+    acceptance_rate: np.ndarray
+    cancellation_reliability: np.ndarray
+    recent_activeness: np.ndarray
+    safety_score: np.ndarray
+    overall_priority_score: np.ndarray
+    rank: np.ndarray
+    
+    # (N, 6) weighted factor terms summed into overall_priority_score, columns in
+    # FACTOR_NAMES order; ready for stacked-bar/pie/heatmap plots without re-extraction
+    contributions: Optional[np.ndarray] = None
+    
+    _positions: Dict[str, int] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # reversed() so a duplicated earner_id maps to its best-ranked entry
+        self._positions = {
+            earner_id: pos
+            for pos, earner_id in reversed(list(enumerate(self.earner_id.tolist())))
+        }
+    
+    def __len__(self) -> int:
+        return len(self.earner_id)
+    
+    def __getitem__(self, earner_id: str) -> DriverPriorityScore:
+        return self.score_at(self._positions[earner_id])
+    
+    def get(self, earner_id: str) -> Optional[DriverPriorityScore]:
+        """Score for one driver, or None if unknown"""
+        pos = self._positions.get(earner_id)
+        return None if pos is None else self.score_at(pos)
+    
+    def top(self, n: int) -> 'PriorityScoresSoA':
+        """First n (best-ranked) drivers as a new SoA"""
+        contributions = None if self.contributions is None else self.contributions[:n]
+        return PriorityScoresSoA(
+            **{name: getattr(self, name)[:n] for name in _SCORE_FIELDS},
+            contributions=contributions
+        )
+    
+    def score_at(self, pos: int) -> DriverPriorityScore:
+        """Materialize the driver at position pos as a DriverPriorityScore"""
+        return DriverPriorityScore(**{name: getattr(self, name)[pos:pos + 1].tolist()[0] for name in _SCORE_FIELDS})
+    
+    def to_scores(self) -> List[DriverPriorityScore]:
+        """Materialize every row as a DriverPriorityScore (best driver first)"""
+        columns = [getattr(self, name).tolist() for name in _SCORE_FIELDS]
+        return [DriverPriorityScore(*row) for row in zip(*columns)]
+
+
+_SCORE_FIELDS = tuple(f.name for f in fields(DriverPriorityScore))
+
+
 class DriverPrioritizationAgent:
     """
     Intelligent driver prioritization using Experience-Aware Rating (EAR)
@@ -67,28 +242,44 @@ class DriverPrioritizationAgent:
             city_id: Optional city ID to filter drivers (1-5). If None, uses all drivers.
             active_only: If True, only include drivers with ride history. Default: True
         """
-        # Load earner data
-        self.drivers_df = pd.read_excel(data_path, sheet_name=0)
+        # Configuration parameters (needed by _enrich_driver_data below)
+        self.config = {
+            'platform_avg_rating': 4.7,  # Global prior (a)
+            'equivalent_prior_trips': 20,  # m - how many trips before rating stabilizes
+            'n95_trips': 1500,  # Trip count for 95% of max experience credit (raised from 500)
+            'max_incidents': 10,  # For normalizing safety scores
+            'activeness_window_days': 30,  # Look at last 30 days
+        }
+        
+        # Weights for combining factors
+        self.weights = {
+            'rating': 0.35,
+            'acceptance': 0.15,
+            'cancellation': 0.15,
+            'activeness': 0.15,
+            'safety': 0.10,
+            'experience_boost': 0.10,
+        }
+        
+        # Private generator for synthetic metrics (no global NumPy RNG state);
+        # kept on the instance so a re-run of _enrich_driver_data continues its stream
+        self._rng = np.random.default_rng(MOCK_DATA_SEED)
+        
+        # Loop-invariant constants derived from config and weights
+        self._refresh_derived_constants()
+        
+        # Memoized priority_scores() result
+        self._cached_scores: Optional[PriorityScoresSoA] = None
+        
+        # Load earner data with pre-calculated metrics
         self.active_only = active_only
         self.city_id = city_id
-        
-        # Load pre-calculated metrics
-        self.metrics_loaded = False
-        try:
-            metrics_df = pd.read_csv(metrics_path)
-            # Merge metrics with earner data
-            self.drivers_df = self.drivers_df.merge(metrics_df, on='earner_id', how='left')
-            self.metrics_loaded = True
-            print(f"✅ Loaded driver metrics from {metrics_path}")
-        except FileNotFoundError:
-            print(f"⚠️  Metrics file not found: {metrics_path}")
-            print(f"   Will generate metrics on-the-fly...")
-            self._enrich_driver_data()
+        self._load_drivers(data_path, metrics_path)
         
         # Filter to active drivers only (those with ride history)
         if active_only:
             try:
-                rides_df = pd.read_excel(data_path, sheet_name='rides_trips')
+                rides_df = _read_excel_sheet(data_path, 'rides_trips')
                 active_driver_ids = list(rides_df['driver_id'].unique())
                 initial_count = len(self.drivers_df)
                 filtered_df: pd.DataFrame = self.drivers_df[self.drivers_df['earner_id'].isin(active_driver_ids)].copy()  # type: ignore[assignment]
@@ -106,32 +297,26 @@ class DriverPrioritizationAgent:
             if len(self.drivers_df) == 0:
                 print(f"⚠️  Warning: No drivers found for city_id {city_id}")
                 # Reload all drivers
-                self.drivers_df = pd.read_excel(data_path, sheet_name=0)
-                if self.metrics_loaded:
-                    metrics_df = pd.read_csv(metrics_path)
-                    self.drivers_df = self.drivers_df.merge(metrics_df, on='earner_id', how='left')
+                self._load_drivers(data_path, metrics_path)
                 self.city_id = None
             else:
                 print(f"🏙️  Filtered to city {city_id}: {len(self.drivers_df)} drivers (from {initial_count} total)")
-        
-        # Configuration parameters
-        self.config = {
-            'platform_avg_rating': 4.7,  # Global prior (a)
-            'equivalent_prior_trips': 20,  # m - how many trips before rating stabilizes
-            'n95_trips': 1500,  # Trip count for 95% of max experience credit (raised from 500)
-            'max_incidents': 10,  # For normalizing safety scores
-            'activeness_window_days': 30,  # Look at last 30 days
-        }
-        
-        # Weights for combining factors
-        self.weights = {
-            'rating': 0.35,
-            'acceptance': 0.15,
-            'cancellation': 0.15,
-            'activeness': 0.15,
-            'safety': 0.10,
-            'experience_boost': 0.10,
-        }
+    
+    def _load_drivers(self, data_path: str, metrics_path: str):
+        """Load earners, merge (or generate) metrics, and enforce SCORING_DTYPES"""
+        self.drivers_df = _read_excel_sheet(data_path, 0)
+        self.metrics_loaded = False
+        try:
+            metrics_df = pd.read_csv(metrics_path)
+            # Merge metrics with earner data
+            self.drivers_df = self.drivers_df.merge(metrics_df, on='earner_id', how='left')
+            self.metrics_loaded = True
+            print(f"✅ Loaded driver metrics from {metrics_path}")
+        except FileNotFoundError:
+            print(f"⚠️  Metrics file not found: {metrics_path}")
+            print(f"   Will generate metrics on-the-fly...")
+            self._enrich_driver_data()
+        self.drivers_df = self.drivers_df.astype(SCORING_DTYPES)
     
     def _enrich_driver_data(self):
         """Calculate additional metrics for each driver (fallback if CSV not available)"""
@@ -139,52 +324,54 @@ class DriverPrioritizationAgent:
         if self.metrics_loaded:
             return
             
-        np.random.seed(42)  # For reproducible mock data
+        rng = self._rng  # Seeded with MOCK_DATA_SEED for reproducible mock data
+        df = self.drivers_df
+        num_drivers = len(df)
+        
+        # Work on plain ndarrays (no Series index alignment); columns are assigned at the end
+        rating = df['rating'].to_numpy(dtype=np.float64)
+        experience_months = df['experience_months'].to_numpy(dtype=np.float64)
+        status = df['status'].to_numpy()
         
         # Use experience_months to estimate completed trips
         # Assuming avg 100 trips per month for active drivers
-        self.drivers_df['completed_trips'] = (
-            self.drivers_df['experience_months'] * 
-            np.random.uniform(80, 120, len(self.drivers_df))
-        ).astype(int)
+        completed_trips = (experience_months * rng.uniform(80, 120, num_drivers)).astype(int)
         
         # Generate realistic acceptance rates (better drivers accept more)
         # Correlate with rating
-        rating_normalized = (self.drivers_df['rating'] - 4.2) / 0.8
-        self.drivers_df['acceptance_rate'] = np.clip(
-            rating_normalized * 0.3 + np.random.uniform(0.6, 0.95, len(self.drivers_df)),
+        rating_normalized = (rating - 4.2) / 0.8
+        acceptance_rate = np.clip(
+            rating_normalized * 0.3 + rng.uniform(0.6, 0.95, num_drivers),
             0.5, 1.0
         )
         
         # Generate cancellation rates (better drivers cancel less)
-        self.drivers_df['cancellation_rate'] = np.clip(
-            (5.0 - self.drivers_df['rating']) * 0.04 + np.random.uniform(0, 0.08, len(self.drivers_df)),
+        cancellation_rate = np.clip(
+            (5.0 - rating) * 0.04 + rng.uniform(0, 0.08, num_drivers),
             0.0, 0.25
         )
         
-        # Generate recent activeness based on status
-        base_activeness = {
-            'online': np.random.uniform(0.7, 1.0),
-            'engaged': np.random.uniform(0.7, 1.0),
-            'offline': np.random.uniform(0.0, 0.5)
-        }
-        # Use list comprehension instead of apply to avoid type issues
-        days_active = []
-        for status in self.drivers_df['status']:
-            days_active.append(np.random.uniform(*self._activeness_range(status)))
-        self.drivers_df['days_active_last30'] = days_active
-        self.drivers_df['activeness_score'] = self.drivers_df['days_active_last30'] / 30
+        # Generate recent activeness based on status (same ranges as _activeness_range),
+        # drawn for all drivers in one call with per-driver bounds
+        is_active = (status == 'online') | (status == 'engaged')
+        is_offline = status == 'offline'
+        low = np.select([is_active, is_offline], [20.0, 0.0], default=10.0)
+        high = np.select([is_active, is_offline], [30.0, 15.0], default=20.0)
+        days_active = rng.uniform(low, high)
         
         # Generate safety/complaint scores (fewer incidents = better score)
         # Better rated drivers have fewer incidents
-        incident_rate = (5.0 - self.drivers_df['rating']) * 0.5
-        self.drivers_df['safety_incidents'] = np.random.poisson(
-            incident_rate, len(self.drivers_df)
-        )
-        self.drivers_df['safety_score'] = 1 - (
-            self.drivers_df['safety_incidents'] / self.config['max_incidents']
-        )
-        self.drivers_df['safety_score'] = self.drivers_df['safety_score'].clip(0, 1)
+        incident_rate = (5.0 - rating) * 0.5
+        safety_incidents = rng.poisson(incident_rate, num_drivers)
+        safety_score = np.clip(1 - safety_incidents / self.config['max_incidents'], 0, 1)
+        
+        df['completed_trips'] = completed_trips
+        df['acceptance_rate'] = acceptance_rate
+        df['cancellation_rate'] = cancellation_rate
+        df['days_active_last30'] = days_active
+        df['activeness_score'] = days_active / 30
+        df['safety_incidents'] = safety_incidents
+        df['safety_score'] = safety_score
     
     def _activeness_range(self, status: str) -> Tuple[float, float]:
         """Return activeness range based on status"""
@@ -195,6 +382,34 @@ class DriverPrioritizationAgent:
         }
         return ranges.get(status, (10, 20))
     
+    def _refresh_derived_constants(self):
+        """Precompute m*a, 1/log(1+N95) and the FACTOR_NAMES-ordered weight vector"""
+        self._m_times_a = self.config['equivalent_prior_trips'] * self.config['platform_avg_rating']
+        self._inv_log1p_n95 = 1.0 / np.log1p(self.config['n95_trips'])
+        self._weights_vec = np.array([self.weights[name] for name in FACTOR_NAMES], dtype=np.float64)
+    
+    def invalidate_cache(self):
+        """Drop memoized scores so the next call recomputes them"""
+        self._cached_scores = None
+    
+    def update_weights(self, **weights: float):
+        """Change factor weights and invalidate the cached scores"""
+        unknown = set(weights) - set(self.weights)
+        if unknown:
+            raise ValueError(f"Unknown weight(s): {', '.join(sorted(unknown))}")
+        self.weights.update(weights)
+        self._refresh_derived_constants()
+        self.invalidate_cache()
+    
+    def update_config(self, **config):
+        """Change configuration parameters and invalidate the cached scores"""
+        unknown = set(config) - set(self.config)
+        if unknown:
+            raise ValueError(f"Unknown config key(s): {', '.join(sorted(unknown))}")
+        self.config.update(config)
+        self._refresh_derived_constants()
+        self.invalidate_cache()
+    
     def calculate_experience_aware_rating(
         self, 
         driver_rating: float, 
@@ -212,13 +427,13 @@ class DriverPrioritizationAgent:
         
         This shrinks each driver's rating toward the global average,
         with less shrinkage as they complete more trips.
+        Works element-wise on NumPy arrays as well as on scalars.
         """
-        a = self.config['platform_avg_rating']
         m = self.config['equivalent_prior_trips']
         n = completed_trips
         r = driver_rating
         
-        ear = (m * a + n * r) / (m + n)
+        ear = (self._m_times_a + n * r) / (m + n)
         return ear
     
     def calculate_experience_boost(self, completed_trips: int) -> float:
@@ -230,15 +445,17 @@ class DriverPrioritizationAgent:
         
         This rewards volume with diminishing returns - a driver with 1000 trips
         isn't twice as good as one with 500 trips.
+        Works element-wise on NumPy arrays as well as on scalars.
         """
-        n = completed_trips
-        n95 = self.config['n95_trips']
+        n = np.asarray(completed_trips, dtype=float)
         
-        if n <= 0:
-            return 0.0
-        
-        experience_boost = np.log(1 + n) / np.log(1 + n95)
-        return min(experience_boost, 1.0)  # Cap at 1.0
+        # No credit for n <= 0, cap at 1.0
+        experience_boost = np.where(
+            n > 0,
+            np.minimum(np.log1p(np.maximum(n, 0)) * self._inv_log1p_n95, 1.0),
+            0.0
+        )
+        return float(experience_boost) if experience_boost.ndim == 0 else experience_boost
     
     def calculate_reliability_score(
         self,
@@ -286,118 +503,132 @@ class DriverPrioritizationAgent:
         
         return score
     
+    def priority_scores(self) -> PriorityScoresSoA:
+        """
+        Calculate priority scores for all drivers and rank them, as column arrays.
+        
+        Scores are computed once and memoized; use update_weights/update_config
+        (or invalidate_cache) to force a recomputation.
+        """
+        if self._cached_scores is None:
+            self._cached_scores = self._compute_priority_scores()
+        return self._cached_scores
+    
     def prioritize_all_drivers(self) -> List[DriverPriorityScore]:
         """Calculate priority scores for all drivers and rank them"""
-        priority_scores = []
-        
-        for _, driver in self.drivers_df.iterrows():  # type: ignore[union-attr]
-            # Calculate EAR
-            ear = self.calculate_experience_aware_rating(
-                float(driver['rating']),
-                int(driver['completed_trips'])
-            )
-            
-            # Calculate experience boost
-            exp_boost = self.calculate_experience_boost(int(driver['completed_trips']))
-            
-            # Get reliability metrics
-            A, C = self.calculate_reliability_score(
-                float(driver['acceptance_rate']),
-                float(driver['cancellation_rate'])
-            )
-            
-            # Calculate overall score
-            overall_score = self.calculate_overall_priority_score(
-                ear=ear,
-                experience_boost=exp_boost,
-                acceptance_rate=A,
-                cancellation_reliability=C,
-                activeness_score=float(driver['activeness_score']),
-                safety_score=float(driver['safety_score'])
-            )
-            
-            priority_scores.append(DriverPriorityScore(
-                earner_id=str(driver['earner_id']),
-                raw_rating=float(driver['rating']),
-                experience_adjusted_rating=ear,
-                experience_boost=exp_boost,
-                acceptance_rate=A,
-                cancellation_reliability=C,
-                recent_activeness=float(driver['activeness_score']),
-                safety_score=float(driver['safety_score']),
-                overall_priority_score=overall_score,
-                rank=0  # Will be assigned after sorting
-            ))
-        
-        # Sort by overall score (descending) and assign ranks
-        priority_scores.sort(key=lambda x: x.overall_priority_score, reverse=True)
-        for rank, score in enumerate(priority_scores, 1):
-            score.rank = rank
-        
-        return priority_scores
+        return self.priority_scores().to_scores()
+    
+    def _compute_priority_scores(self) -> PriorityScoresSoA:
+        """Score every driver in drivers_df, sorted by priority with ranks assigned"""
+        columns = self._score_columns()
+        # Sort by overall score (descending, ties keep input order)
+        order = np.argsort(-columns['overall_priority_score'], kind='stable')
+        return self._ranked(columns, order)
+    
+    def _score_columns(self) -> Dict[str, np.ndarray]:
+        """Unsorted per-driver score columns, keyed by PriorityScoresSoA field (minus rank)"""
+        df = self.drivers_df
+        # Columns already have SCORING_DTYPES, so these are zero-copy views
+        raw_rating = df['rating'].to_numpy(dtype=np.float64, copy=False)
+        completed_trips = df['completed_trips'].to_numpy(dtype=np.int64, copy=False)
+        activeness = df['activeness_score'].to_numpy(dtype=np.float64, copy=False)
+        safety = df['safety_score'].to_numpy(dtype=np.float64, copy=False)
+        acceptance = df['acceptance_rate'].to_numpy(dtype=np.float64, copy=False)
+        cancellation = df['cancellation_rate'].to_numpy(dtype=np.float64, copy=False)
+        
+        # All factors are computed column-wise over the whole fleet at once
+        ear, exp_boost, overall, contributions = _score_kernel(
+            raw_rating, completed_trips, acceptance, cancellation, activeness, safety,
+            m=self.config['equivalent_prior_trips'],
+            a=self.config['platform_avg_rating'],
+            n95=self.config['n95_trips'],
+            weights=self._weights_vec
+        )
+        
+        return {
+            'earner_id': df['earner_id'].astype(str).to_numpy(),
+            'raw_rating': raw_rating,
+            'experience_adjusted_rating': ear,
+            'experience_boost': exp_boost,
+            'acceptance_rate': acceptance,
+            'cancellation_reliability': 1 - cancellation,
+            'recent_activeness': activeness,
+            'safety_score': safety,
+            'overall_priority_score': overall,
+            'contributions': contributions,
+        }
+    
+    @staticmethod
+    def _ranked(columns: Dict[str, np.ndarray], order: np.ndarray) -> PriorityScoresSoA:
+        """Reorder score columns by order (best first) and assign ranks 1..len(order)"""
+        return PriorityScoresSoA(
+            **{name: column[order] for name, column in columns.items()},
+            rank=np.arange(1, len(order) + 1)
+        )
     
     def get_top_drivers(self, n: int = 10) -> List[DriverPriorityScore]:
         """Get top N prioritized drivers"""
-        all_scores = self.prioritize_all_drivers()
-        return all_scores[:n]
+        if self._cached_scores is not None or not 0 < n < len(self.drivers_df):
+            return self.priority_scores().top(n).to_scores()
+        
+        # Only n drivers are needed: O(N) selection instead of a full sort
+        columns = self._score_columns()
+        order = _top_k_order(columns['overall_priority_score'], n)
+        return self._ranked(columns, order).to_scores()
     
     def get_driver_priority(self, earner_id: str) -> Optional[DriverPriorityScore]:
         """Get priority score for a specific driver"""
-        all_scores = self.prioritize_all_drivers()
-        for score in all_scores:
-            if score.earner_id == earner_id:
-                return score
-        return None
+        return self.priority_scores().get(earner_id)
     
     def print_priority_report(self, scores: List[DriverPriorityScore]):
         """Print detailed priority report"""
-        print("=" * 100)
-        print(" 🎯 DRIVER PRIORITIZATION REPORT - Experience-Aware Rating (EAR) System")
-        print("=" * 100)
-        print()
-        
-        print(f"📊 System Configuration:")
-        print(f"   Platform Average Rating: {self.config['platform_avg_rating']:.2f}")
-        print(f"   Equivalent Prior Trips: {self.config['equivalent_prior_trips']}")
-        print(f"   N95 Experience Threshold: {self.config['n95_trips']} trips")
+        lines = []
+        lines.append("=" * 100)
+        lines.append(" 🎯 DRIVER PRIORITIZATION REPORT - Experience-Aware Rating (EAR) System")
+        lines.append("=" * 100)
+        lines.append("")
+        
+        lines.append(f"📊 System Configuration:")
+        lines.append(f"   Platform Average Rating: {self.config['platform_avg_rating']:.2f}")
+        lines.append(f"   Equivalent Prior Trips: {self.config['equivalent_prior_trips']}")
+        lines.append(f"   N95 Experience Threshold: {self.config['n95_trips']} trips")
         if self.city_id is not None:
-            print(f"   🏙️  City Filter: City {self.city_id} only")
+            lines.append(f"   🏙️  City Filter: City {self.city_id} only")
         if self.active_only:
-            print(f"   🚗 Active Drivers Only: Drivers with ride history")
-        print()
+            lines.append(f"   🚗 Active Drivers Only: Drivers with ride history")
+        lines.append("")
         
-        print(f"⚖️  Factor Weights:")
+        lines.append(f"⚖️  Factor Weights:")
         for factor, weight in self.weights.items():
-            print(f"   {factor.capitalize():.<30} {weight:.1%}")
-        print()
+            lines.append(f"   {factor.capitalize():.<30} {weight:.1%}")
+        lines.append("")
         
-        print("=" * 100)
-        print(f"{'Rank':<6} {'Driver ID':<12} {'Raw★':<7} {'EAR★':<7} {'Exp↑':<7} "
-              f"{'Accept':<8} {'!Cancel':<8} {'Active':<8} {'Safety':<8} {'PRIORITY':<10}")
-        print("=" * 100)
+        lines.append("=" * 100)
+        lines.append(f"{'Rank':<6} {'Driver ID':<12} {'Raw★':<7} {'EAR★':<7} {'Exp↑':<7} "
+                     f"{'Accept':<8} {'!Cancel':<8} {'Active':<8} {'Safety':<8} {'PRIORITY':<10}")
+        lines.append("=" * 100)
         
         for score in scores:
-            print(f"{score.rank:<6} "
-                  f"{score.earner_id:<12} "
-                  f"{score.raw_rating:<7.2f} "
-                  f"{score.experience_adjusted_rating:<7.2f} "
-                  f"{score.experience_boost:<7.2%} "
-                  f"{score.acceptance_rate:<8.1%} "
-                  f"{score.cancellation_reliability:<8.1%} "
-                  f"{score.recent_activeness:<8.1%} "
-                  f"{score.safety_score:<8.1%} "
-                  f"{score.overall_priority_score:<10.4f}")
-        
-        print("=" * 100)
-        print()
+            lines.append(f"{score.rank:<6} "
+                         f"{score.earner_id:<12} "
+                         f"{score.raw_rating:<7.2f} "
+                         f"{score.experience_adjusted_rating:<7.2f} "
+                         f"{score.experience_boost:<7.2%} "
+                         f"{score.acceptance_rate:<8.1%} "
+                         f"{score.cancellation_reliability:<8.1%} "
+                         f"{score.recent_activeness:<8.1%} "
+                         f"{score.safety_score:<8.1%} "
+                         f"{score.overall_priority_score:<10.4f}")
+        
+        lines.append("=" * 100)
+        lines.append("")
         
         # Insights
         top_driver = scores[0]
-        print(f"🏆 Top Driver: {top_driver.earner_id}")
-        print(f"   Priority Score: {top_driver.overall_priority_score:.4f}")
-        print(f"   EAR (Experience-Adjusted Rating): {top_driver.experience_adjusted_rating:.2f}★")
-        print(f"   Experience Boost: {top_driver.experience_boost:.1%}")
-        print(f"   Key Strength: ", end="")
+        lines.append(f"🏆 Top Driver: {top_driver.earner_id}")
+        lines.append(f"   Priority Score: {top_driver.overall_priority_score:.4f}")
+        lines.append(f"   EAR (Experience-Adjusted Rating): {top_driver.experience_adjusted_rating:.2f}★")
+        lines.append(f"   Experience Boost: {top_driver.experience_boost:.1%}")
         
         # Identify key strength
         strengths = {
@@ -409,82 +640,85 @@ class DriverPrioritizationAgent:
             'Experience': top_driver.experience_boost
         }
         best_strength = max(strengths.keys(), key=lambda k: strengths[k])
-        print(f"{best_strength} ({strengths[best_strength]:.1%})")
-        print()
+        lines.append(f"   Key Strength: {best_strength} ({strengths[best_strength]:.1%})")
+        lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
     
     def explain_algorithm(self):
         """Print detailed explanation of the algorithm"""
-        print("=" * 100)
-        print(" 📚 EXPERIENCE-AWARE RATING (EAR) ALGORITHM EXPLANATION")
-        print("=" * 100)
-        print()
-        
-        print("🎯 OBJECTIVE:")
-        print("   Fairly prioritize drivers considering both quality AND experience,")
-        print("   while accounting for reliability, activeness, and safety.")
-        print()
-        
-        print("📊 CORE FORMULA - Experience-Aware Rating (EAR):")
-        print()
-        print("   EAR = (m × a + n × r) / (m + n)")
-        print()
-        print("   where:")
-        print(f"   • r = driver's raw rating (1-5 stars)")
-        print(f"   • n = total completed trips")
-        print(f"   • a = platform-wide average rating ({self.config['platform_avg_rating']})")
-        print(f"   • m = equivalent prior trips ({self.config['equivalent_prior_trips']})")
-        print()
-        print("   This uses Bayesian shrinkage to:")
-        print("   - Pull new drivers' ratings toward the global average (prevents lucky/unlucky starts)")
-        print("   - Give more weight to experienced drivers' actual ratings")
-        print()
-        
-        print("📈 EXPERIENCE BOOST - E(n):")
-        print()
-        print("   E(n) = log(1+n) / log(1 + N95)")
-        print()
-        print(f"   where N95 = {self.config['n95_trips']} trips (95% of max experience credit)")
-        print()
-        print("   This rewards volume with diminishing returns:")
-        print("   - 50 trips  → ~35% experience credit")
-        print("   - 100 trips → ~48% experience credit")
-        print("   - 500 trips → ~95% experience credit")
-        print("   - 1000 trips → ~99% experience credit")
-        print()
-        
-        print("⚖️  RELIABILITY & ENGAGEMENT FACTORS:")
-        print()
-        print("   A = Acceptance Rate (0-1)")
-        print("      How often the driver accepts ride requests")
-        print()
-        print("   C = 1 - Cancellation Rate (0-1)")
-        print("      Reliability measure (higher = more reliable)")
-        print()
-        print("   L = days_active_last30 / 30 (0-1)")
-        print("      Recent activeness in last 30 days")
-        print()
-        print("   S = 1 - incidents/Smax (0-1)")
-        print("      Safety score (normalized complaints/incidents)")
-        print()
-        
-        print("🎲 FINAL PRIORITY SCORE:")
-        print()
-        print("   Priority = Σ(weight_i × factor_i)")
-        print()
-        print("   Current weights:")
+        lines = []
+        lines.append("=" * 100)
+        lines.append(" 📚 EXPERIENCE-AWARE RATING (EAR) ALGORITHM EXPLANATION")
+        lines.append("=" * 100)
+        lines.append("")
+        
+        lines.append("🎯 OBJECTIVE:")
+        lines.append("   Fairly prioritize drivers considering both quality AND experience,")
+        lines.append("   while accounting for reliability, activeness, and safety.")
+        lines.append("")
+        
+        lines.append("📊 CORE FORMULA - Experience-Aware Rating (EAR):")
+        lines.append("")
+        lines.append("   EAR = (m × a + n × r) / (m + n)")
+        lines.append("")
+        lines.append("   where:")
+        lines.append(f"   • r = driver's raw rating (1-5 stars)")
+        lines.append(f"   • n = total completed trips")
+        lines.append(f"   • a = platform-wide average rating ({self.config['platform_avg_rating']})")
+        lines.append(f"   • m = equivalent prior trips ({self.config['equivalent_prior_trips']})")
+        lines.append("")
+        lines.append("   This uses Bayesian shrinkage to:")
+        lines.append("   - Pull new drivers' ratings toward the global average (prevents lucky/unlucky starts)")
+        lines.append("   - Give more weight to experienced drivers' actual ratings")
+        lines.append("")
+        
+        lines.append("📈 EXPERIENCE BOOST - E(n):")
+        lines.append("")
+        lines.append("   E(n) = log(1+n) / log(1 + N95)")
+        lines.append("")
+        lines.append(f"   where N95 = {self.config['n95_trips']} trips (95% of max experience credit)")
+        lines.append("")
+        lines.append("   This rewards volume with diminishing returns:")
+        lines.append("   - 50 trips  → ~35% experience credit")
+        lines.append("   - 100 trips → ~48% experience credit")
+        lines.append("   - 500 trips → ~95% experience credit")
+        lines.append("   - 1000 trips → ~99% experience credit")
+        lines.append("")
+        
+        lines.append("⚖️  RELIABILITY & ENGAGEMENT FACTORS:")
+        lines.append("")
+        lines.append("   A = Acceptance Rate (0-1)")
+        lines.append("      How often the driver accepts ride requests")
+        lines.append("")
+        lines.append("   C = 1 - Cancellation Rate (0-1)")
+        lines.append("      Reliability measure (higher = more reliable)")
+        lines.append("")
+        lines.append("   L = days_active_last30 / 30 (0-1)")
+        lines.append("      Recent activeness in last 30 days")
+        lines.append("")
+        lines.append("   S = 1 - incidents/Smax (0-1)")
+        lines.append("      Safety score (normalized complaints/incidents)")
+        lines.append("")
+        
+        lines.append("🎲 FINAL PRIORITY SCORE:")
+        lines.append("")
+        lines.append("   Priority = Σ(weight_i × factor_i)")
+        lines.append("")
+        lines.append("   Current weights:")
         for factor, weight in self.weights.items():
-            print(f"   • {factor.capitalize():<20} {weight:.1%}")
-        print()
-        
-        print("💡 WHY THIS WORKS:")
-        print("   ✅ Fair to new drivers (Bayesian shrinkage prevents rating volatility)")
-        print("   ✅ Rewards experience (but with diminishing returns)")
-        print("   ✅ Considers reliability (acceptance & cancellation)")
-        print("   ✅ Encourages activeness (recent activity matters)")
-        print("   ✅ Prioritizes safety (penalizes incidents)")
-        print("   ✅ Balanced (multiple factors prevent gaming the system)")
-        print()
-        print("=" * 100)
+            lines.append(f"   • {factor.capitalize():<20} {weight:.1%}")
+        lines.append("")
+        
+        lines.append("💡 WHY THIS WORKS:")
+        lines.append("   ✅ Fair to new drivers (Bayesian shrinkage prevents rating volatility)")
+        lines.append("   ✅ Rewards experience (but with diminishing returns)")
+        lines.append("   ✅ Considers reliability (acceptance & cancellation)")
+        lines.append("   ✅ Encourages activeness (recent activity matters)")
+        lines.append("   ✅ Prioritizes safety (penalizes incidents)")
+        lines.append("   ✅ Balanced (multiple factors prevent gaming the system)")
+        lines.append("")
+        lines.append("=" * 100)
+        sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
@@ -499,8 +733,9 @@ def main():
     print("\n" + "="*100)
     print()
     
-    # Get top 20 drivers
-    top_drivers = agent.get_top_drivers(n=100)
+    # Score the fleet once; the report and the lookup below both reuse it
+    all_scores = agent.priority_scores()
+    top_drivers = all_scores.top(100).to_scores()
     
     # Print report
     agent.print_priority_report(top_drivers)
@@ -511,7 +746,7 @@ def main():
     print("="*100)
     
     specific_driver = top_drivers[5].earner_id  # 6th best driver
-    driver_score = agent.get_driver_priority(specific_driver)
+    driver_score = all_scores.get(specific_driver)
     
     if driver_score:
         print(f"\nDriver: {driver_score.earner_id}")